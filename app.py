@@ -1,20 +1,337 @@
-from flask import Flask, render_template, send_file, request, redirect, url_for, session
+from flask import Flask, render_template, send_file, request, redirect, url_for, session, jsonify, Response, g
 import os
+import re
+import time
+import math
+import decimal
+import datetime
+import itertools
+from dataclasses import dataclass, field
+import zipfile
+import json
+import uuid
+import io
+import zlib
+import importlib.util
+import csv
+import codecs
+import shutil
+import tempfile
+import hashlib
+import base64
+import threading
+import multiprocessing
+import logging
+import contextlib
+import cProfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import pymysql
-import pandas as pd
-import requests
-from io import BytesIO
+from pymysql.constants import ER, FIELD_TYPE, FLAG
+from xml.sax.saxutils import escape
 from werkzeug.utils import secure_filename
-import openpyxl
+from werkzeug.http import http_date
 
-app = Flask(__name__)
-app.secret_key = "key"  # Necesario para usar sesiones
+
+# -----------------------REGISTRO DIFERIDO DE RUTAS---------------------------------------
+
+class RegistroRutas:
+    # Guarda las rutas y los ganchos declarados en el módulo para registrarlos
+    # en cada aplicación creada por crear_app, conservando los nombres de
+    # endpoint que usan las plantillas, url_for y las métricas
+    def __init__(self):
+        self.reglas = []
+        self.antes = []
+        self.despues = []
+
+    def add_url_rule(self, regla, endpoint, vista, **opciones):
+        self.reglas.append((regla, endpoint, vista, opciones))
+
+    def route(self, regla, **opciones):
+        def decorador(vista):
+            self.add_url_rule(regla, opciones.pop("endpoint", vista.__name__), vista, **opciones)
+            return vista
+        return decorador
+
+    def before_request(self, funcion):
+        self.antes.append(funcion)
+        return funcion
+
+    def after_request(self, funcion):
+        self.despues.append(funcion)
+        return funcion
+
+    def registrar(self, aplicacion):
+        for regla, endpoint, vista, opciones in self.reglas:
+            aplicacion.add_url_rule(regla, endpoint, vista, **opciones)
+        for funcion in self.antes:
+            aplicacion.before_request(funcion)
+        for funcion in self.despues:
+            aplicacion.after_request(funcion)
+
+
+rutas = RegistroRutas()
 
 # Obtén la ruta del directorio actual del script
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
+# -----------------------METRICAS E INSTRUMENTACION---------------------------------------
+
+# Registro estructurado: una línea JSON por petición y por trabajo de carga
+logging.basicConfig(level=os.getenv("NIVEL_LOG", "INFO"), format="%(message)s")
+registro = logging.getLogger("evaluacion_docente")
+
+# Directorio donde cada proceso publica sus métricas para que /metrics devuelva
+# la suma de todos los trabajadores de gunicorn (vacío: solo las del proceso)
+DIRECTORIO_METRICAS = os.getenv("DIRECTORIO_METRICAS", os.path.join(tempfile.gettempdir(), "metricas_evaluacion"))
+
+# Segundos mínimos entre dos escrituras del archivo de métricas de un proceso
+METRICAS_INTERVALO_ESCRITURA = float(os.getenv("METRICAS_INTERVALO_ESCRITURA", "1"))
+
+# Límites de los histogramas de duración (segundos)
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Descripción de cada métrica expuesta en /metrics
+DESCRIPCIONES_METRICAS = {
+    "http_peticion_segundos": ("histogram", "Duración de las peticiones HTTP hasta enviar los encabezados"),
+    "carga_etapa_segundos": ("histogram", "Tiempo propio de cada etapa de una carga"),
+    "carga_duracion_segundos": ("histogram", "Duración total de los trabajos de carga"),
+    "carga_filas_total": ("counter", "Filas leídas por los trabajos de carga"),
+    "carga_bytes_total": ("counter", "Bytes de los archivos cargados"),
+    "exportacion_etapa_segundos": ("histogram", "Tiempo propio de cada etapa de una exportación"),
+    "exportacion_filas_total": ("counter", "Filas exportadas"),
+    "exportacion_bytes_total": ("counter", "Bytes generados por las exportaciones"),
+    "exportacion_cache_total": ("counter", "Exportaciones servidas por resultado de la caché"),
+    "pool_espera_segundos": ("histogram", "Espera para obtener una conexión del pool"),
+    "pool_agotado_total": ("counter", "Esperas del pool que agotaron el tiempo máximo"),
+    "api_paginas_total": ("counter", "Páginas de la API de informes por resultado"),
+}
+
+
+def registrar_evento(evento, nivel=logging.INFO, **campos):
+    registro.log(nivel, json.dumps({"evento": evento, **campos}, default=str, ensure_ascii=False))
+
+
+def escapar_etiqueta(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RegistroMetricas:
+    # Cada trabajador acumula sus métricas en memoria y las vuelca a su propio
+    # archivo en el directorio compartido; /metrics suma los archivos de todos
+    # los procesos (también los de trabajadores ya terminados, para que los
+    # contadores no retrocedan entre una consulta y otra)
+    def __init__(self, directorio=None):
+        self.directorio = directorio
+        self.reiniciar()
+
+    def reiniciar(self):
+        # También se llama en el proceso hijo después de un fork: empieza vacío
+        # y con su propio archivo
+        self.bloqueo = threading.Lock()
+        self.histogramas = {}
+        self.contadores = {}
+        self.archivo = None
+        if self.directorio:
+            os.makedirs(self.directorio, exist_ok=True)
+            self.archivo = os.path.join(self.directorio, f"{os.getpid()}_{uuid.uuid4().hex[:8]}.json")
+        self.proxima_escritura = 0.0
+
+    def volcar(self, forzar=False):
+        if not self.archivo:
+            return
+        ahora = time.monotonic()
+        with self.bloqueo:
+            if not forzar and ahora < self.proxima_escritura:
+                return
+            self.proxima_escritura = ahora + METRICAS_INTERVALO_ESCRITURA
+            datos = {
+                "histogramas": [
+                    [nombre, etiquetas, [list(cubetas), cantidad, suma]]
+                    for (nombre, etiquetas), (cubetas, cantidad, suma) in self.histogramas.items()
+                ],
+                "contadores": [[nombre, etiquetas, valor] for (nombre, etiquetas), valor in self.contadores.items()],
+            }
+        # Escritura atómica: los demás procesos nunca leen un archivo a medias
+        temporal = f"{self.archivo}.tmp"
+        try:
+            with open(temporal, "w", encoding="utf-8") as destino:
+                json.dump(datos, destino)
+            os.replace(temporal, self.archivo)
+        except OSError:
+            pass
+
+    def combinadas(self):
+        # Suma de las métricas de todos los procesos que publican en el directorio
+        self.volcar(forzar=True)
+        if not self.archivo:
+            with self.bloqueo:
+                return dict(self.histogramas), dict(self.contadores)
+
+        histogramas, contadores = {}, {}
+        for nombre_archivo in os.listdir(self.directorio):
+            if not nombre_archivo.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directorio, nombre_archivo), encoding="utf-8") as origen:
+                    datos = json.load(origen)
+            except (OSError, ValueError):
+                continue
+            for nombre, etiquetas, (cubetas, cantidad, suma) in datos["histogramas"]:
+                clave = nombre, tuple(tuple(par) for par in etiquetas)
+                previas, cantidad_previa, suma_previa = histogramas.get(clave) or ([0] * len(cubetas), 0, 0.0)
+                histogramas[clave] = (
+                    [a + b for a, b in zip(previas, cubetas)], cantidad_previa + cantidad, suma_previa + suma
+                )
+            for nombre, etiquetas, valor in datos["contadores"]:
+                clave = nombre, tuple(tuple(par) for par in etiquetas)
+                contadores[clave] = contadores.get(clave, 0) + valor
+        return histogramas, contadores
+
+    def clave(self, nombre, etiquetas):
+        return nombre, tuple(sorted((etiqueta, str(valor)) for etiqueta, valor in etiquetas.items()))
+
+    def observar(self, nombre, valor, **etiquetas):
+        clave = self.clave(nombre, etiquetas)
+        with self.bloqueo:
+            cubetas, cantidad, suma = self.histogramas.get(clave) or ([0] * len(LIMITES_SEGUNDOS), 0, 0.0)
+            for posicion, limite in enumerate(LIMITES_SEGUNDOS):
+                if valor <= limite:
+                    cubetas[posicion] += 1
+            self.histogramas[clave] = (cubetas, cantidad + 1, suma + valor)
+        self.volcar()
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = self.clave(nombre, etiquetas)
+        with self.bloqueo:
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+        self.volcar()
+
+    def exportar(self):
+        # Formato de texto de Prometheus (versión 0.0.4)
+        def etiquetas_texto(etiquetas, extra=()):
+            pares = list(etiquetas) + list(extra)
+            if not pares:
+                return ""
+            return "{" + ",".join(f'{nombre}="{escapar_etiqueta(valor)}"' for nombre, valor in pares) + "}"
+
+        histogramas, contadores = self.combinadas()
+
+        lineas = []
+        for nombre, (tipo, descripcion) in DESCRIPCIONES_METRICAS.items():
+            lineas.append(f"# HELP {nombre} {descripcion}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            if tipo == "histogram":
+                for (metrica, etiquetas), (cubetas, cantidad, suma) in sorted(histogramas.items()):
+                    if metrica != nombre:
+                        continue
+                    for limite, acumulado in zip(LIMITES_SEGUNDOS, cubetas):
+                        lineas.append(f"{nombre}_bucket{etiquetas_texto(etiquetas, [('le', limite)])} {acumulado}")
+                    lineas.append(f"{nombre}_bucket{etiquetas_texto(etiquetas, [('le', '+Inf')])} {cantidad}")
+                    lineas.append(f"{nombre}_sum{etiquetas_texto(etiquetas)} {suma}")
+                    lineas.append(f"{nombre}_count{etiquetas_texto(etiquetas)} {cantidad}")
+            else:
+                for (metrica, etiquetas), valor in sorted(contadores.items()):
+                    if metrica == nombre:
+                        lineas.append(f"{nombre}{etiquetas_texto(etiquetas)} {valor}")
+        return "\n".join(lineas) + "\n"
+
+
+metricas = RegistroMetricas(DIRECTORIO_METRICAS)
+os.register_at_fork(after_in_child=metricas.reiniciar)
+
+# Marca el final de un flujo medido con medir_filas
+FIN_FILAS = object()
+
+
+class CronometroEtapas:
+    # Acumula el tiempo propio de cada etapa: el tiempo de las etapas anidadas
+    # se descuenta de la etapa que las contiene
+    def __init__(self):
+        self.etapas = {}
+        self._pila = []
+
+    @contextlib.contextmanager
+    def etapa(self, nombre):
+        self._pila.append(0.0)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            total = time.perf_counter() - inicio
+            self.sumar(nombre, total - self._pila.pop())
+            if self._pila:
+                self._pila[-1] += total
+
+    def medir_filas(self, nombre, filas):
+        # Mide solo el tiempo dentro del generador, no el del consumidor
+        iterador = iter(filas)
+        reloj = time.perf_counter
+        pila = self._pila
+        propio = 0.0
+        try:
+            while True:
+                pila.append(0.0)
+                inicio = reloj()
+                row = next(iterador, FIN_FILAS)
+                total = reloj() - inicio
+                propio += total - pila.pop()
+                if pila:
+                    pila[-1] += total
+                if row is FIN_FILAS:
+                    return
+                yield row
+        finally:
+            self.sumar(nombre, propio)
+
+    def sumar(self, nombre, segundos):
+        self.etapas[nombre] = self.etapas.get(nombre, 0.0) + segundos
+
+
+def medir(cronometro, nombre):
+    # Las funciones de carga también se usan sin trabajo asociado
+    return cronometro.etapa(nombre) if cronometro is not None else contextlib.nullcontext()
+
+
+@rutas.before_request
+def iniciar_medicion_peticion():
+    g.inicio_peticion = time.perf_counter()
+
+
+@rutas.after_request
+def registrar_peticion(respuesta):
+    inicio = g.pop("inicio_peticion", None)
+    if inicio is None or request.endpoint == "exponer_metricas":
+        return respuesta
+
+    segundos = time.perf_counter() - inicio
+    endpoint = request.endpoint or "desconocido"
+    metricas.observar(
+        "http_peticion_segundos", segundos,
+        endpoint=endpoint, metodo=request.method, estado=respuesta.status_code,
+    )
+    registrar_evento(
+        "peticion",
+        metodo=request.method,
+        ruta=request.path,
+        endpoint=endpoint,
+        estado=respuesta.status_code,
+        milisegundos=round(segundos * 1000, 1),
+        bytes=None if respuesta.is_streamed else respuesta.calculate_content_length(),
+    )
+    return respuesta
+
+
+@rutas.route("/metrics")
+def exponer_metricas():
+    return Response(metricas.exportar(), mimetype="text/plain; version=0.0.4")
+
+
 # -----------------------CONEXION A BASE DE DATOS---------------------------------------
 
+# Activa la carga rápida con LOAD DATA LOCAL INFILE en los cargadores
+CARGA_RAPIDA = os.getenv("CARGA_RAPIDA", "0") == "1"
+
 
 def conectar_base_datos():
     try:
@@ -34,488 +351,3975 @@ def conectar_base_datos():
         db_name = "evaluacion_docente"
 
         connection = pymysql.connect(
-            host=db_host, user=db_user, password=db_password, database=db_name
+            host=db_host,
+            user=db_user,
+            password=db_password,
+            database=db_name,
+            local_infile=CARGA_RAPIDA,
         )
-        print("Conexión exitosa a la base de datos")
+        registrar_evento("conexion_base_datos", host=db_host, base=db_name)
         return connection
 
     except pymysql.Error as e:
-        print(f"Error al conectar a la base de datos: {e}")
+        registrar_evento("error_conexion_base_datos", logging.ERROR, host=db_host, error=str(e))
         return None
 
 
-# -------------------------------FUNCION PARA DESCARGAR EXCEL-------------------------------------------
-@app.route("/descargar_informe_final")
-def descargar_informe_final():
-    # Conectar a la base de datos
-    connection = conectar_base_datos()
-    if connection is None:
-        return "Error de conexión a la base de datos"
+# -----------------------POOL DE CONEXIONES---------------------------------------
 
-    try:
-        # Consulta SQL para obtener los datos
-        query = "SELECT * FROM informes_finales"  # Cambia el nombre de la tabla
+# Número máximo de conexiones abiertas por proceso
+POOL_TAMANO = int(os.getenv("POOL_TAMANO", "5"))
 
-        # Obtener los datos en un DataFrame de pandas
-        df = pd.read_sql_query(query, connection)
+# Segundos tras los cuales una conexión se cierra y se vuelve a abrir
+POOL_RECICLAR_SEGUNDOS = int(os.getenv("POOL_RECICLAR_SEGUNDOS", "1800"))
 
-        # Crear un archivo Excel en memoria (BytesIO)
-        excel_buffer = BytesIO()
-        df.to_excel(excel_buffer, index=False)
-        excel_buffer.seek(0)
+# Segundos máximos que una petición espera por una conexión libre
+POOL_ESPERA_MAXIMA = float(os.getenv("POOL_ESPERA_MAXIMA", "30"))
 
-        # Enviar el archivo Excel como respuesta al usuario
-        return send_file(
-            excel_buffer,
-            as_attachment=True,
-            download_name="Informes Finales.xlsx",
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
+# Verificar con ping cada conexión antes de entregarla
+POOL_PRE_PING = os.getenv("POOL_PRE_PING", "1") == "1"
 
-    finally:
-        # Cerrar la conexión a la base de datos
-        connection.close()
 
-# -------------------------------FUNCION PARA DESCARGAR EXCEL-------------------------------------------
-@app.route("/descargar_informe_final_duplicados")
-def descargar_informe_final_duplicados():
-    # Conectar a la base de datos
-    connection = conectar_base_datos()
-    if connection is None:
-        return "Error de conexión a la base de datos"
+class ConexionPool:
+    # Envoltura de una conexión prestada: close() la devuelve al pool
 
-    try:
-        # Consulta SQL para obtener los datos
-        query = "SELECT * FROM informes_finales_duplicados"  # Cambia el nombre de la tabla
+    def __init__(self, pool, conexion, creada_en):
+        self._pool = pool
+        self._conexion = conexion
+        self._creada_en = creada_en
 
-        # Obtener los datos en un DataFrame de pandas
-        df = pd.read_sql_query(query, connection)
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
 
-        # Crear un archivo Excel en memoria (BytesIO)
-        excel_buffer = BytesIO()
-        df.to_excel(excel_buffer, index=False)
-        excel_buffer.seek(0)
+    def close(self):
+        if self._conexion is not None:
+            self._pool.devolver(self._conexion, self._creada_en)
+            self._conexion = None
 
-        # Enviar el archivo Excel como respuesta al usuario
-        return send_file(
-            excel_buffer,
-            as_attachment=True,
-            download_name="Informes Finales Duplicados.xlsx",
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
 
-    finally:
-        # Cerrar la conexión a la base de datos
-        connection.close()
+class PoolConexiones:
+    def __init__(self, fabrica, tamano, reciclar_segundos, espera_maxima, pre_ping):
+        self._fabrica = fabrica
+        self._tamano = tamano
+        self._reciclar_segundos = reciclar_segundos
+        self._espera_maxima = espera_maxima
+        self._pre_ping = pre_ping
 
-# -----------------------------FUNCIONES CARGA DE ARCHIVOS PLANOS EVALUACIONES-----------------------------------------------
+        self._condicion = threading.Condition()
+        self._libres = deque()
+        self._en_uso = 0
 
+        # Estadísticas del pool
+        self._prestamos = 0
+        self._creadas = 0
+        self._descartadas = 0
+        self._tiempo_espera_total = 0.0
+        self._tiempo_espera_max = 0.0
 
-# -----------------------FUNCION CARGA DE DATOS EVALUACION ESTUDIANTES---------------------------------
-@app.route("/cargar_datos_eval_estudiantes", methods=["GET", "POST"])
-def cargar_datos_eval_estudiantes():
-    if request.method == "POST":
-        # Obtener el archivo Excel desde el formulario
-        archivo_excel = request.files["archivo_excel"]
+    def _descartar(self, conexion):
+        self._descartadas += 1
+        try:
+            conexion.close()
+        except pymysql.Error:
+            pass
 
+    def _conexion_sana(self, conexion, creada_en):
+        # Reciclar conexiones viejas antes de que el servidor las cierre
+        if time.monotonic() - creada_en > self._reciclar_segundos:
+            return False
+        if not self._pre_ping:
+            return True
         try:
-            # Leer el archivo Excel
-            wb = openpyxl.load_workbook(archivo_excel)
-            hoja = wb.active
-
-            # Conectar a la base de datos
-            connection = conectar_base_datos()
-
-            if connection:
-                # Crear un cursor
-                cur = connection.cursor()
-
-                # Truncate table antes del bucle
-                truncate_query = "TRUNCATE TABLE e_estud"
-                cur.execute(truncate_query)
-
-                # Iterar sobre las filas del archivo Excel e insertar en la base de datos
-                for row in hoja.iter_rows(min_row=2, values_only=True):
-                    # Verificar y reemplazar celdas vacías con un valor por defecto
-                    row = [value if value is not None else " " for value in row]
-
-                    # Construir la consulta INSERT sin la columna autoincremental
-                    columnas = """
-                        ID_ENCUESTA_QUSUARIO, ID_GRUPO_DOCENTE, FACULTAD, PROGRAMA, GRUPO,
-                        DOCUMENTO_DOCENTE, NOMBRE_DOCENTE, CARGO_DOCENTE, ENCUESTA,
-                        ID_OPERARIO_U, FECHA_DILIGENCIAMIENTO, PREGUNTA1, PREGUNTA2,
-                        PREGUNTA3, PREGUNTA4, PREGUNTA5, PREGUNTA6, PREGUNTA7, PREGUNTA8,
-                        PREGUNTA9, PREGUNTA10, PREGUNTA11, PREGUNTA12, PREGUNTA13,
-                        PREGUNTA14, PREGUNTA15, PREGUNTA16, PREGUNTA17, PREGUNTA18,
-                        PREGUNTA19, PREGUNTA20, PREGUNTA21, PREGUNTA22, PREGUNTA23,
-                        PREGUNTA24, PREGUNTA25, PREGUNTA26, PREGUNTA27, PREGUNTA28,
-                        PREGUNTA29, PREGUNTA30, PREGUNTA31, PREGUNTA32, PREGUNTA33,
-                        PREGUNTA34, PREGUNTA35, PREGUNTA36, PREGUNTA37, PREGUNTA38,
-                        PREGUNTA39, PREGUNTA40
-                    """
-                    marcadores = ", ".join(["%s"] * len(row))
-
-                    query = (
-                        f"INSERT INTO e_estud ({columnas}) VALUES ({marcadores})"
+            conexion.ping(reconnect=False)
+            return True
+        except pymysql.Error:
+            return False
+
+    def obtener(self):
+        inicio = time.perf_counter()
+
+        with self._condicion:
+            # Esperar a que haya una conexión libre o cupo para abrir una nueva
+            limite = inicio + self._espera_maxima
+            while not self._libres and self._en_uso >= self._tamano:
+                restante = limite - time.perf_counter()
+                if restante <= 0 or not self._condicion.wait(restante):
+                    registrar_evento(
+                        "pool_agotado", logging.WARNING, espera_s=self._espera_maxima, en_uso=self._en_uso
                     )
+                    metricas.incrementar("pool_agotado_total")
+                    return None
 
-                    # Ejecutar la consulta
-                    cur.execute(query, row)
+            conexion, creada_en = self._libres.pop() if self._libres else (None, None)
+            self._en_uso += 1
 
-                # Commit y cerrar la conexión
-                connection.commit()
-                cur.close()
-                connection.close()
+        try:
+            # Validar la conexión reutilizada o abrir una nueva fuera del bloqueo
+            if conexion is not None and not self._conexion_sana(conexion, creada_en):
+                self._descartar(conexion)
+                conexion = None
 
-            # Mensaje de éxito almacenado en la sesión
-            session["message"] = "Carga exitosa. Los datos se han subido correctamente."
+            if conexion is None:
+                conexion = self._fabrica()
+                creada_en = time.monotonic()
+                if conexion is None:
+                    raise pymysql.OperationalError("No se pudo abrir una conexión nueva")
+                self._creadas += 1
 
-            # Redirigir a la ruta carga_exitosa
-            return redirect(url_for("carga_exitosa_estud"))
+        except pymysql.Error:
+            with self._condicion:
+                self._en_uso -= 1
+                self._condicion.notify()
+            return None
 
-        except Exception as e:
-            # Mensaje de error almacenado en la sesión
-            session["message"] = f"Error durante la carga de datos: {str(e)}"
+        espera = time.perf_counter() - inicio
+        metricas.observar("pool_espera_segundos", espera)
+        with self._condicion:
+            self._prestamos += 1
+            self._tiempo_espera_total += espera
+            self._tiempo_espera_max = max(self._tiempo_espera_max, espera)
+
+        return ConexionPool(self, conexion, creada_en)
+
+    def devolver(self, conexion, creada_en):
+        # Descartar cualquier transacción pendiente antes de reutilizar la conexión
+        try:
+            conexion.rollback()
+            reutilizable = True
+        except pymysql.Error:
+            reutilizable = False
+
+        with self._condicion:
+            if reutilizable:
+                self._libres.append((conexion, creada_en))
+            else:
+                self._descartar(conexion)
+            self._en_uso -= 1
+            self._condicion.notify()
+
+    def reiniciar_tras_fork(self):
+        # El proceso hijo no puede usar los sockets heredados del padre: se
+        # olvidan sin cerrarlos (close() enviaría COM_QUIT por la conexión que
+        # el padre sigue usando) y el hijo abre las suyas
+        self._condicion = threading.Condition()
+        self._libres = deque()
+        self._en_uso = 0
+
+    def estadisticas(self):
+        with self._condicion:
+            return {
+                "tamano": self._tamano,
+                "en_uso": self._en_uso,
+                "libres": len(self._libres),
+                "prestamos": self._prestamos,
+                "creadas": self._creadas,
+                "descartadas": self._descartadas,
+                "tiempo_espera_total": round(self._tiempo_espera_total, 6),
+                "tiempo_espera_promedio": round(
+                    self._tiempo_espera_total / self._prestamos if self._prestamos else 0.0, 6
+                ),
+                "tiempo_espera_max": round(self._tiempo_espera_max, 6),
+            }
+
+
+pool_conexiones = PoolConexiones(
+    conectar_base_datos,
+    POOL_TAMANO,
+    POOL_RECICLAR_SEGUNDOS,
+    POOL_ESPERA_MAXIMA,
+    POOL_PRE_PING,
+)
+
+
+# Ninguna conexión abierta antes de un fork (gunicorn con preload_app, lectores
+# de los lotes) debe compartirse entre procesos
+os.register_at_fork(after_in_child=pool_conexiones.reiniciar_tras_fork)
 
-    # Redirigir en caso de no ser un método POST o en caso de carga exitosa
-    return redirect(url_for("e_estud_py_dashboard"))
 
+def obtener_conexion():
+    # Tomar una conexión prestada del pool; se devuelve llamando a close()
+    return pool_conexiones.obtener()
 
-@app.route("/carga_exitosa_estud")
-def carga_exitosa_estud():
-    # Obtener el mensaje de la sesión
-    message = session.pop("message", None)
-    return render_template("carga_exitosa_estud.html", message=message)
 
+@rutas.route("/estadisticas_pool")
+def estadisticas_pool():
+    return jsonify(pool_conexiones.estadisticas())
 
-@app.route("/e_estud_py_dashboard")
-def e_estud_py_dashboard():
-    # return redirect("http://localhost/evaluacion_docente/dashboard/e_estud_py.php")
-    return redirect(
-        "https://apps1.colmayor.edu.co/evaluacion_docente/dashboard/e_estud_py.php"
+
+# -----------------------INSERCION MASIVA POR LOTES---------------------------------------
+
+# Número de filas que se envían en cada executemany (configurable por entorno)
+TAMANO_LOTE_INSERT = int(os.getenv("TAMANO_LOTE_INSERT", "5000"))
+
+# Margen reservado dentro de max_allowed_packet para la cabecera de la sentencia
+MARGEN_PAQUETE = 64 * 1024
+
+
+def ajustar_tamano_sentencia(cur):
+    # PyMySQL agrupa executemany en INSERT multi-fila de hasta max_stmt_length
+    # bytes; se ajusta al max_allowed_packet del servidor para no excederlo
+    try:
+        cur.execute("SELECT @@max_allowed_packet")
+        max_paquete = int(cur.fetchone()[0])
+        cur.max_stmt_length = max(MARGEN_PAQUETE, max_paquete - MARGEN_PAQUETE)
+    except pymysql.Error as e:
+        registrar_evento("max_allowed_packet_no_disponible", logging.WARNING, error=str(e))
+
+
+def separar_columnas(columnas):
+    return [columna.strip() for columna in columnas.split(",") if columna.strip()]
+
+
+def consulta_insert(tabla, lista_columnas):
+    marcadores = ", ".join(["%s"] * len(lista_columnas))
+    return f"INSERT INTO {tabla} ({', '.join(lista_columnas)}) VALUES ({marcadores})"
+
+
+def insertar_por_lotes(cur, tabla, query, filas, tamano_lote=None, confirmar=None, progreso=None):
+    # La consulta INSERT llega ya preparada desde el esquema de la encuesta
+    tamano_lote = tamano_lote or TAMANO_LOTE_INSERT
+    ajustar_tamano_sentencia(cur)
+
+    inicio = time.perf_counter()
+    total = 0
+    lote = []
+
+    # Enviar las filas en lotes para reducir los viajes al servidor
+    for row in filas:
+        lote.append(row)
+        if len(lote) >= tamano_lote:
+            with medir(progreso, "insercion"):
+                cur.executemany(query, lote)
+            total += len(lote)
+            lote = []
+            if confirmar:
+                confirmar(total)
+
+    if lote:
+        with medir(progreso, "insercion"):
+            cur.executemany(query, lote)
+        total += len(lote)
+
+    segundos = time.perf_counter() - inicio
+    filas_por_segundo = total / segundos if segundos > 0 else float(total)
+    registrar_evento(
+        "insercion_por_lotes",
+        tabla=tabla,
+        filas=total,
+        segundos=round(segundos, 2),
+        filas_por_segundo=round(filas_por_segundo),
     )
+    return total, filas_por_segundo
+
+
+# -----------------------LECTURA EN STREAMING DE ARCHIVOS SUBIDOS---------------------------------------
+
+# Directorio donde se vuelcan las subidas (por defecto el temporal del sistema)
+DIRECTORIO_TEMPORAL = os.getenv("DIRECTORIO_TEMPORAL") or None
+
+# Tamaño de bloque para copiar la subida a disco
+TAMANO_BLOQUE_COPIA = 1024 * 1024
+
+
+def guardar_archivo_temporal(archivo):
+    # Volcar la subida a disco por bloques en lugar de mantenerla en memoria
+    sufijo = os.path.splitext(secure_filename(archivo.filename or ""))[1].lower() or ".xlsx"
+    fd, ruta = tempfile.mkstemp(suffix=sufijo, dir=DIRECTORIO_TEMPORAL)
+    with os.fdopen(fd, "wb") as destino:
+        shutil.copyfileobj(archivo.stream, destino, TAMANO_BLOQUE_COPIA)
+    return ruta
+
 
-    # -----------------------FUNCION CARGA DE DATOS AUTOEVALUACION CON CATEDRA ---------------------------------
+def eliminar_archivo_temporal(ruta):
+    if ruta and os.path.exists(ruta):
+        os.remove(ruta)
 
 
-@app.route("/cargar_datos_ae_doc_catedra", methods=["GET", "POST"])
-def cargar_datos_ae_doc_catedra():
-    if request.method == "POST":
-        # Obtener el archivo Excel desde el formulario
-        archivo_excel = request.files["archivo_excel"]
-        print(archivo_excel)
+def leer_filas_excel(ruta, desde_fila=2):
+    # En modo read_only openpyxl recorre la hoja de forma perezosa sin
+    # construir todas las celdas en memoria
+    import openpyxl
 
+    wb = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        hoja = wb.active
+        for row in hoja.iter_rows(min_row=desde_fila, values_only=True):
+            yield row
+    finally:
+        wb.close()
+
+
+# Codificación detectada de cada CSV, por ruta, fecha de modificación y tamaño
+codificaciones_csv = {}
+
+
+def fila_no_decodificable(ruta, codificacion):
+    # Número de fila (1 = encabezado) del primer byte que no se puede
+    # decodificar, o None si el archivo completo es válido
+    decodificador = codecs.getincrementaldecoder(codificacion)()
+    saltos = 0
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(TAMANO_BLOQUE_COPIA), b""):
+            try:
+                decodificador.decode(bloque)
+            except UnicodeDecodeError as e:
+                # El decodificador puede retener bytes de un bloque anterior
+                inicio = max(0, e.start - (len(e.object) - len(bloque)))
+                return saltos + bloque[:inicio].count(b"\n") + 1
+            saltos += bloque.count(b"\n")
         try:
-            # Leer el archivo Excel
-            wb = openpyxl.load_workbook(archivo_excel)
-            hoja = wb.active
-
-            # Conectar a la base de datos
-            connection = conectar_base_datos()
-
-            if connection:
-                # Crear un cursor
-                cur = connection.cursor()
-
-                # Truncate table antes del bucle
-                truncate_query = "TRUNCATE TABLE ae_docente_catedra"
-                cur.execute(truncate_query)
-
-                # Iterar sobre las filas del archivo Excel e insertar en la base de datos
-                for row in hoja.iter_rows(min_row=2, values_only=True):
-                    # Verificar y reemplazar celdas vacías con un valor por defecto
-                    row = [value if value is not None else " " for value in row]
-
-                    # Construir la consulta INSERT sin la columna autoincremental
-                    columnas = """
-                                ID_ENCUESTA_QUSUARIO, ID_DOCENTE, FACULTAD, PROGRAMA, DOCUMENTO_DOCENTE,
-                                NOMBRE_DOCENTE, CARGO_DOCENTE, ENCUESTA, FECHA_DILIGENCIAMIENTO, PREGUNTA1,
-                                PREGUNTA2, PREGUNTA3, PREGUNTA4, PREGUNTA5, PREGUNTA6, PREGUNTA7, PREGUNTA8,
-                                PREGUNTA9, PREGUNTA10, PREGUNTA11, PREGUNTA12, PREGUNTA13, PREGUNTA14,
-                                PREGUNTA15, PREGUNTA16, PREGUNTA17, PREGUNTA18, PREGUNTA19, PREGUNTA20,
-                                PREGUNTA21, PREGUNTA22, PREGUNTA23, PREGUNTA24, PREGUNTA25, PREGUNTA26,
-                                PREGUNTA27, PREGUNTA28, PREGUNTA29, PREGUNTA30, PREGUNTA31
-                            """
-                    marcadores = ", ".join(["%s"] * len(row))
-
-                    query = (
-                        f"INSERT INTO ae_docente_catedra ({columnas}) VALUES ({marcadores})"
-                    )
+            decodificador.decode(b"", final=True)
+        except UnicodeDecodeError:
+            return saltos + 1
+    return None
 
-                    # Ejecutar la consulta
-                    cur.execute(query, row)
 
-                # Commit y cerrar la conexión
-                connection.commit()
-                cur.close()
-                connection.close()
+def codificacion_csv(ruta):
+    # Excel en español guarda "CSV (delimitado por comas)" en Windows-1252: el
+    # archivo se lee como UTF-8 solo si es UTF-8 válido de principio a fin.
+    # Devuelve la codificación y la fila no decodificable, si la hay
+    estado = os.stat(ruta)
+    clave = (ruta, estado.st_mtime_ns, estado.st_size)
+    if clave not in codificaciones_csv:
+        if fila_no_decodificable(ruta, "utf-8") is None:
+            resultado = ("utf-8-sig", None)
+        else:
+            resultado = ("cp1252", fila_no_decodificable(ruta, "cp1252"))
+        if len(codificaciones_csv) > 64:
+            codificaciones_csv.clear()
+        codificaciones_csv[clave] = resultado
+    return codificaciones_csv[clave]
+
 
-            # Mensaje de éxito almacenado en la sesión
-            session["message"] = "Carga exitosa. Los datos se han subido correctamente."
+def error_codificacion(numero_fila):
+    reporte = nuevo_reporte()
+    reporte["valido"] = False
+    reporte["errores"] = 1
+    reporte["columnas"]["_CODIFICACION"] = {
+        "motivo": "el CSV no está en UTF-8 ni en Windows-1252",
+        "errores": 1,
+        "filas": [numero_fila],
+    }
+    return ArchivoInvalido(
+        reporte,
+        f"El archivo CSV no está en UTF-8 ni en Windows-1252 (fila {numero_fila}). "
+        "Guárdelo como \"CSV UTF-8 (delimitado por comas)\" y vuelva a cargarlo.",
+    )
 
-            # Redirigir a la ruta carga_exitosa
-            return redirect(url_for("carga_exitosa_ae_doc_cat"))
 
-        except Exception as e:
-            # Mensaje de error almacenado en la sesión
-            session["message"] = f"Error durante la carga de datos: {str(e)}"
+def leer_filas_csv(ruta, desde_fila=2):
+    # Un archivo que no se puede decodificar se rechaza antes de leer filas
+    codificacion, fila_invalida = codificacion_csv(ruta)
+    if fila_invalida is not None:
+        raise error_codificacion(fila_invalida)
+
+    with open(ruta, newline="", encoding=codificacion) as archivo:
+        # Detectar el separador (coma, punto y coma o tabulador) con una muestra
+        muestra = archivo.read(64 * 1024)
+        archivo.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+
+        lector = csv.reader(archivo, dialecto)
+
+        # Omitir la fila de encabezados
+        for _ in range(desde_fila - 1):
+            next(lector, None)
+
+        # Las celdas vacías del CSV se tratan igual que las celdas vacías de Excel
+        for row in lector:
+            yield [value or None for value in row]
+
+
+def leer_filas_archivo(ruta, desde_fila=2):
+    if ruta.lower().endswith(".csv"):
+        return leer_filas_csv(ruta, desde_fila)
+    return leer_filas_excel(ruta, desde_fila)
+
+
+def leer_encabezado(ruta):
+    filas = leer_filas_archivo(ruta, desde_fila=1)
+    try:
+        return next(filas, None)
+    finally:
+        filas.close()
+
 
-    # Redirigir en caso de no ser un método POST o en caso de carga exitosa
-    return redirect(url_for("ae_catedra_py_dashboard"))
+def normalizar_filas(filas, conversores=()):
+    # Verificar y reemplazar celdas vacías con un valor por defecto y aplicar
+    # los conversores precompilados del esquema a las demás celdas
+    for row in filas:
+        row = [value if value is not None else " " for value in row]
+        for posicion, conversor in conversores:
+            if posicion < len(row) and row[posicion] != " ":
+                row[posicion] = conversor(row[posicion])
+        yield row
 
 
-@app.route("/carga_exitosa_ae_doc_cat")
-def carga_exitosa_ae_doc_cat():
-    # Obtener el mensaje de la sesión
-    message = session.pop("message", None)
-    return render_template("carga_exitosa_ae_doc_cat.html", message=message)
+def filas_del_archivo(ruta, esquema, progreso=None, duplicados=None, omitir=0, cur_hashes=None):
+    # Flujo completo: lectura perezosa, validación y conversión por bloques,
+    # conteo opcional de avance, separación opcional de duplicados, registro
+    # opcional del hash de cada fila y salto de las filas ya confirmadas
+    reporte = nuevo_reporte()
+    if progreso is None:
+        filas = convertir_bloques(leer_filas_archivo(ruta), esquema, reporte)
+    else:
+        progreso.reporte = reporte
+        filas = progreso.medir_filas("lectura", leer_filas_archivo(ruta))
+        filas = progreso.medir_filas("validacion", convertir_bloques(filas, esquema, reporte))
+        filas = progreso.contar(filas)
+    if duplicados is not None:
+        filas = duplicados.filtrar(filas)
+    if cur_hashes is not None:
+        filas = registrar_hashes(cur_hashes, esquema, filas)
+    if omitir:
+        filas = itertools.islice(filas, omitir, None)
+    return filas
 
 
-@app.route("/ae_catedra_py_dashboard")
-def ae_catedra_py_dashboard():
-    # return redirect("http://localhost/evaluacion_docente/dashboard/ae_doc_cat_py.php")
-    return redirect(
-        "https://apps1.colmayor.edu.co/evaluacion_docente/dashboard/ae_doc_cat_py.php"
+# -----------------------DETECCION DE DUPLICADOS DURANTE LA CARGA---------------------------------------
+
+# Separar las filas repetidas mientras se lee el archivo
+DETECTAR_DUPLICADOS = os.getenv("DETECTAR_DUPLICADOS", "1") == "1"
+
+# Aparición que se conserva en la tabla: "primera" o "ultima"
+POLITICA_DUPLICADOS = os.getenv("POLITICA_DUPLICADOS", "primera")
+
+# Llaves de duplicado por tabla que reemplazan las del esquema, por ejemplo
+# {"e_estud": ["DOCUMENTO_DOCENTE", "GRUPO", "ID_ENCUESTA_QUSUARIO"]}
+LLAVES_DUPLICADOS = json.loads(os.getenv("LLAVES_DUPLICADOS", "{}"))
+
+# Tabla auxiliar donde se guardan las filas descartadas de cada carga
+TABLA_DUPLICADOS = "duplicados_carga"
+
+# Duplicados de las cargas en curso; pasan a la tabla auxiliar al publicarse la carga
+TABLA_DUPLICADOS_PENDIENTES = "duplicados_carga_pendientes"
+
+COLUMNAS_DUPLICADOS = "TABLA, LLAVE, FILA_ARCHIVO, POLITICA, DATOS, FECHA_CARGA"
+
+
+def crear_tabla_duplicados(cur):
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_DUPLICADOS} (
+            ID_DUPLICADO BIGINT AUTO_INCREMENT PRIMARY KEY,
+            TABLA VARCHAR(64) NOT NULL,
+            LLAVE VARCHAR(512) NOT NULL,
+            FILA_ARCHIVO INT NOT NULL,
+            POLITICA VARCHAR(16) NOT NULL,
+            DATOS MEDIUMTEXT NOT NULL,
+            FECHA_CARGA DATETIME NOT NULL,
+            INDEX IDX_DUPLICADOS_TABLA (TABLA, LLAVE(191))
+        )
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_DUPLICADOS_PENDIENTES} (
+            ID_DUPLICADO BIGINT AUTO_INCREMENT PRIMARY KEY,
+            ID_TRABAJO CHAR(32) NOT NULL,
+            TABLA VARCHAR(64) NOT NULL,
+            LLAVE VARCHAR(512) NOT NULL,
+            FILA_ARCHIVO INT NOT NULL,
+            POLITICA VARCHAR(16) NOT NULL,
+            DATOS MEDIUMTEXT NOT NULL,
+            FECHA_CARGA DATETIME NOT NULL,
+            INDEX IDX_PENDIENTES_TRABAJO (ID_TRABAJO),
+            INDEX IDX_PENDIENTES_TABLA (TABLA)
+        )
+        """
     )
 
-    # -----------------------FUNCION CARGA DE DATOS AUTOEVALUACION SIN CATEDRA ---------------------------------
 
+def columnas_llave(esquema):
+    # Llave que identifica una respuesta: la usan el detector de duplicados y
+    # la carga incremental para reemplazar filas
+    return tuple(LLAVES_DUPLICADOS.get(esquema.tabla, esquema.llave_duplicados))
+
+
+class DetectorDuplicados:
+    # Los duplicados se escriben en la tabla de pendientes con el id del trabajo
+    # y solo reemplazan los registrados para la tabla al publicarse la carga; si
+    # la carga falla se descartan y duplicados_carga no cambia
+    def __init__(self, cur, esquema, ruta, id_trabajo, politica=None):
+        self.cur = cur
+        self.esquema = esquema
+        self.id_trabajo = id_trabajo
+        self.politica = politica or POLITICA_DUPLICADOS
+        columnas = columnas_llave(esquema)
+        self.posiciones = [esquema.lista_columnas.index(columna) for columna in columnas]
+        self.query = (
+            f"INSERT INTO {TABLA_DUPLICADOS_PENDIENTES} (ID_TRABAJO, {COLUMNAS_DUPLICADOS}) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+        )
+        self.total = 0
+        self.pendientes = []
+        crear_tabla_duplicados(cur)
+
+        # Para conservar la última aparición se necesita una pasada previa que
+        # registre en qué fila aparece cada llave por última vez
+        self.ultimas = self.indexar_ultimas(ruta) if self.politica == "ultima" else None
+
+    def llave(self, row):
+        partes = [clave_fila(row[posicion]) if posicion < len(row) else "" for posicion in self.posiciones]
+        return "|".join(partes) if any(partes) else None
 
-@app.route("/cargar_datos_ae_doc_sin_catedra", methods=["GET", "POST"])
-def cargar_datos_ae_doc_sin_catedra():
-    if request.method == "POST":
-        # Obtener el archivo Excel desde el formulario
-        archivo_excel = request.files["archivo_excel"]
+    def huella(self, llave):
+        # En memoria solo se guarda un hash de 16 bytes por llave
+        return hashlib.blake2b(llave.encode("utf-8"), digest_size=16).digest()
 
+    def indexar_ultimas(self, ruta):
+        ultimas = {}
+        for numero, row in enumerate(normalizar_filas(leer_filas_archivo(ruta), self.esquema.conversores)):
+            llave = self.llave(row)
+            if llave is not None:
+                ultimas[self.huella(llave)] = numero
+        return ultimas
+
+    def filtrar(self, filas):
+        # Se reinicia al empezar a leer para que un reintento no duplique el registro
+        self.total = 0
+        self.pendientes = []
+        self.cur.execute(
+            f"DELETE FROM {TABLA_DUPLICADOS_PENDIENTES} WHERE ID_TRABAJO = %s", (self.id_trabajo,)
+        )
+        self.fecha = datetime.datetime.now().replace(microsecond=0)
+
+        vistas = set()
+        for numero, row in enumerate(filas):
+            llave = self.llave(row)
+
+            # Las filas sin llave (por ejemplo filas vacías) no se comparan
+            if llave is None:
+                yield row
+                continue
+
+            huella = self.huella(llave)
+            if self.ultimas is not None:
+                conservar = self.ultimas.get(huella) == numero
+            else:
+                conservar = huella not in vistas
+                vistas.add(huella)
+
+            if conservar:
+                yield row
+            else:
+                self.separar(llave, numero, row)
+        self.enviar()
+
+    def separar(self, llave, numero, row):
+        # La fila 1 es el encabezado: los datos empiezan en la fila 2
+        self.pendientes.append(
+            (
+                self.id_trabajo,
+                self.esquema.tabla,
+                llave[:512],
+                numero + 2,
+                self.politica,
+                json.dumps(row, default=str, ensure_ascii=False),
+                self.fecha,
+            )
+        )
+        self.total += 1
+        if len(self.pendientes) >= TAMANO_LOTE_INSERT:
+            self.enviar()
+
+    def enviar(self):
+        if self.pendientes:
+            self.cur.executemany(self.query, self.pendientes)
+            self.pendientes = []
+
+    def publicar(self):
+        # Parte de la publicación de la carga (la confirma quien la llama): los
+        # duplicados de este trabajo reemplazan los registrados para la tabla.
+        # También se limpian los pendientes que hubiera dejado un trabajo
+        # interrumpido; al reanudarlo se vuelven a separar desde el archivo
+        tabla = self.esquema.tabla
+        self.cur.execute(f"DELETE FROM {TABLA_DUPLICADOS} WHERE TABLA = %s", (tabla,))
+        self.cur.execute(
+            f"INSERT INTO {TABLA_DUPLICADOS} ({COLUMNAS_DUPLICADOS}) "
+            f"SELECT {COLUMNAS_DUPLICADOS} FROM {TABLA_DUPLICADOS_PENDIENTES} "
+            "WHERE ID_TRABAJO = %s ORDER BY ID_DUPLICADO",
+            (self.id_trabajo,),
+        )
+        self.cur.execute(f"DELETE FROM {TABLA_DUPLICADOS_PENDIENTES} WHERE TABLA = %s", (tabla,))
+
+    def descartar(self, connection):
+        # Una carga fallida no publica sus duplicados
         try:
-            # Leer el archivo Excel
-            wb = openpyxl.load_workbook(archivo_excel)
-            hoja = wb.active
-
-            # Conectar a la base de datos
-            connection = conectar_base_datos()
-
-            if connection:
-                # Crear un cursor
-                cur = connection.cursor()
-
-                # Truncate table antes del bucle
-                truncate_query = "TRUNCATE TABLE ae_docente_sin_catedra"
-                cur.execute(truncate_query)
-
-                # Iterar sobre las filas del archivo Excel e insertar en la base de datos
-                for row in hoja.iter_rows(min_row=2, values_only=True):
-                    # Verificar y reemplazar celdas vacías con un valor por defecto
-                    row = [value if value is not None else " " for value in row]
-
-                    # Construir la consulta INSERT sin la columna autoincremental
-                    columnas = """
-                        ID_ENCUESTA_QUSUARIO, ID_DOCENTE, FACULTAD, PROGRAMA,
-                        DOCUMENTO_DOCENTE, NOMBRE_DOCENTE, CARGO_DOCENTE, ENCUESTA,
-                        FECHA_DILIGENCIAMIENTO, PREGUNTA1, PREGUNTA2,
-                        PREGUNTA3, PREGUNTA4, PREGUNTA5, PREGUNTA6, PREGUNTA7, PREGUNTA8
-                    """
-                    marcadores = ", ".join(["%s"] * len(row))
-
-                    query = (
-                        f"INSERT INTO ae_docente_sin_catedra ({columnas}) VALUES ({marcadores})"
-                    )
+            connection.rollback()
+            self.cur.execute(
+                f"DELETE FROM {TABLA_DUPLICADOS_PENDIENTES} WHERE ID_TRABAJO = %s", (self.id_trabajo,)
+            )
+            connection.commit()
+        except pymysql.Error:
+            pass
 
-                    # Ejecutar la consulta
-                    cur.execute(query, row)
 
-                # Commit y cerrar la conexión
-                connection.commit()
-                cur.close()
-                connection.close()
+@rutas.route("/descargar_duplicados_carga")
+def descargar_duplicados_carga():
+    # Exportar las filas separadas como duplicadas (filtrar con ?TABLA=e_estud)
+    return descargar_tabla(TABLA_DUPLICADOS, "Duplicados de Carga")
 
-            # Mensaje de éxito almacenado en la sesión
-            session["message"] = "Carga exitosa. Los datos se han subido correctamente."
 
-            # Redirigir a la ruta carga_exitosa
-            return redirect(url_for("carga_exitosa_ae_doc_sin_cat"))
+# -----------------------CARGA RAPIDA CON LOAD DATA LOCAL INFILE---------------------------------------
+
+# Caracteres que deben escaparse en el TSV según el formato por defecto de LOAD DATA
+ESCAPES_TSV = str.maketrans(
+    {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r", "\0": "\\0"}
+)
 
-        except Exception as e:
-            # Mensaje de error almacenado en la sesión
-            session["message"] = f"Error durante la carga de datos: {str(e)}"
 
-    # Redirigir en caso de no ser un método POST o en caso de carga exitosa
-    return redirect(url_for("ae_sin_catedra_py_dashboard"))
+def valor_tsv(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return str(value).translate(ESCAPES_TSV)
 
 
-@app.route("/carga_exitosa_ae_doc_sin_cat")
-def carga_exitosa_ae_doc_sin_cat():
-    # Obtener el mensaje de la sesión
-    message = session.pop("message", None)
-    return render_template("carga_exitosa_ae_doc_sin_cat.html", message=message)
+def escribir_tsv(filas):
+    # Convertir las filas a un TSV temporal mientras se leen del archivo subido
+    fd, ruta_tsv = tempfile.mkstemp(suffix=".tsv", dir=DIRECTORIO_TEMPORAL)
+    with open(fd, "w", encoding="utf-8", newline="\n") as destino:
+        for row in filas:
+            destino.write("\t".join(valor_tsv(value) for value in row))
+            destino.write("\n")
+    return ruta_tsv
 
 
-@app.route("/ae_sin_catedra_py_dashboard")
-def ae_sin_catedra_py_dashboard():
-    # return redirect("http://localhost/evaluacion_docente/dashboard/ae_doc_sin_cat_py.php")
-    return redirect(
-        "https://apps1.colmayor.edu.co/evaluacion_docente/dashboard/ae_doc_sin_cat_py.php"
+def servidor_permite_local_infile(cur):
+    try:
+        cur.execute("SELECT @@local_infile")
+        return bool(int(cur.fetchone()[0]))
+    except pymysql.Error:
+        return False
+
+
+def cargar_con_load_data(cur, tabla, lista_columnas, ruta_tsv):
+    query = (
+        f"LOAD DATA LOCAL INFILE %s INTO TABLE {tabla} CHARACTER SET utf8mb4 "
+        r"FIELDS TERMINATED BY '\t' ESCAPED BY '\\' LINES TERMINATED BY '\n' "
+        f"({', '.join(lista_columnas)})"
     )
 
-    # -----------------------FUNCION CARGA DE DATOS EVALUACION DECANO PLANTA ---------------------------------
+    inicio = time.perf_counter()
+    total = cur.execute(query, (ruta_tsv,))
+    segundos = time.perf_counter() - inicio
+
+    # LOAD DATA LOCAL trata los valores inválidos como IGNORE: los trunca o
+    # convierte con una advertencia en lugar de fallar como los INSERT por lotes.
+    # Cualquier advertencia se trata como error para que el llamador deshaga la
+    # carga y repita con INSERT, que sí rechaza esos valores
+    advertencias = cur.warning_count
+    if advertencias:
+        cur.execute("SHOW WARNINGS LIMIT 3")
+        detalle = "; ".join(str(advertencia[2]) for advertencia in cur.fetchall())
+        raise pymysql.err.DataError(
+            f"LOAD DATA generó {advertencias} advertencias en {tabla}: {detalle}"
+        )
+    filas_por_segundo = total / segundos if segundos > 0 else float(total)
+    registrar_evento(
+        "carga_load_data",
+        tabla=tabla,
+        filas=total,
+        segundos=round(segundos, 2),
+        filas_por_segundo=round(filas_por_segundo),
+    )
+    return total, filas_por_segundo
 
 
-@app.route("/cargar_datos_e_dec_planta", methods=["GET", "POST"])
-def cargar_datos_e_dec_planta():
-    if request.method == "POST":
-        # Obtener el archivo Excel desde el formulario
-        archivo_excel = request.files["archivo_excel"]
+def cargar_filas(connection, cur, esquema, ruta, progreso=None, duplicados=None, punto=None):
+    # Las filas se cargan en la tabla sombra del esquema
+    tabla = esquema.tabla_sombra
+    omitir = punto.inicial if punto else 0
 
+    # Ruta rápida: LOAD DATA LOCAL INFILE si está activada y el servidor lo permite
+    # (es una sola sentencia, así que no se usa al reanudar desde un punto de control)
+    if CARGA_RAPIDA and not omitir and servidor_permite_local_infile(cur):
+        ruta_tsv = None
         try:
-            # Leer el archivo Excel
-            wb = openpyxl.load_workbook(archivo_excel)
-            hoja = wb.active
-
-            # Conectar a la base de datos
-            connection = conectar_base_datos()
-
-            if connection:
-                # Crear un cursor
-                cur = connection.cursor()
-
-                # Truncate table antes del bucle
-                truncate_query = "TRUNCATE TABLE e_decano_planta"
-                cur.execute(truncate_query)
-
-                # Iterar sobre las filas del archivo Excel e insertar en la base de datos
-                for row in hoja.iter_rows(min_row=2, values_only=True):
-                    # Verificar y reemplazar celdas vacías con un valor por defecto
-                    row = [value if value is not None else " " for value in row]
-
-                    # Construir la consulta INSERT sin la columna autoincremental
-                    columnas = """
-                        ID_ENCUESTA_QUSUARIO, ID_DOCENTE, FACULTAD, PROGRAMA,
-                        DOCUMENTO_EVALUADOR, NOMBRE_EVALUADOR, DOCUMENTO_DOCENTE,NOMBRE_DOCENTE,
-                        CARGO_DOCENTE, ENCUESTA, FECHA_DILIGENCIAMIENTO, PREGUNTA1, PREGUNTA2,
-                        PREGUNTA3, PREGUNTA4, PREGUNTA5, PREGUNTA6, PREGUNTA7, PREGUNTA8,
-                        PREGUNTA9, PREGUNTA10, PREGUNTA11, PREGUNTA12, PREGUNTA13,
-                        PREGUNTA14, PREGUNTA15, PREGUNTA16, PREGUNTA17, PREGUNTA18,
-                        PREGUNTA19
-                    """
-                    marcadores = ", ".join(["%s"] * len(row))
-
-                    query = (
-                        f"INSERT INTO e_decano_planta ({columnas}) VALUES ({marcadores})"
-                    )
+            if progreso:
+                progreso.cambiar_fase("convirtiendo")
+            with medir(progreso, "conversion_tsv"):
+                ruta_tsv = escribir_tsv(
+                    filas_del_archivo(ruta, esquema, progreso, duplicados, cur_hashes=cur)
+                )
+            if progreso:
+                progreso.cambiar_fase("cargando")
+            with medir(progreso, "insercion"):
+                return cargar_con_load_data(cur, tabla, esquema.lista_columnas, ruta_tsv)
+        except pymysql.Error as e:
+            # Deshacer cualquier carga parcial y continuar con los INSERT por lotes
+            registrar_evento("load_data_no_disponible", logging.WARNING, tabla=tabla, error=str(e))
+            connection.rollback()
+        finally:
+            eliminar_archivo_temporal(ruta_tsv)
+
+    # Leer el archivo fila a fila, normalizar las celdas vacías e insertar por lotes
+    if progreso:
+        progreso.cambiar_fase("cargando")
+    total, filas_por_segundo = insertar_por_lotes(
+        cur,
+        tabla,
+        esquema.query_insert_sombra,
+        filas_del_archivo(ruta, esquema, progreso, duplicados, omitir, cur),
+        confirmar=punto.confirmar if punto else None,
+        progreso=progreso,
+    )
+    return omitir + total, filas_por_segundo
 
-                    # Ejecutar la consulta
-                    cur.execute(query, row)
 
-                # Commit y cerrar la conexión
-                connection.commit()
-                cur.close()
-                connection.close()
+# -----------------------PUNTOS DE CONTROL DE LA CARGA---------------------------------------
 
-            # Mensaje de éxito almacenado en la sesión
-            session["message"] = "Carga exitosa. Los datos se han subido correctamente."
+# Filas insertadas entre cada confirmación (COMMIT) con punto de control
+FILAS_POR_CONFIRMACION = int(os.getenv("FILAS_POR_CONFIRMACION", "50000"))
 
-            # Redirigir a la ruta carga_exitosa
-            return redirect(url_for("carga_exitosa_e_dec_planta"))
+# Tabla con la última fila confirmada de cada trabajo de carga
+TABLA_PUNTOS_CONTROL = "puntos_control_carga"
 
-        except Exception as e:
-            # Mensaje de error almacenado en la sesión
-            session["message"] = f"Error durante la carga de datos: {str(e)}"
 
-    # Redirigir en caso de no ser un método POST o en caso de carga exitosa
-    return redirect(url_for("e_dec_planta_py_dashboard"))
+def crear_tabla_puntos_control(cur):
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_PUNTOS_CONTROL} (
+            ID_TRABAJO CHAR(32) NOT NULL PRIMARY KEY,
+            TABLA VARCHAR(64) NOT NULL,
+            FILAS_CONFIRMADAS BIGINT NOT NULL,
+            ACTUALIZADO DATETIME NOT NULL
+        )
+        """
+    )
+
+
+class PuntoControl:
+    def __init__(self, connection, cur, progreso, tabla):
+        self.connection = connection
+        self.cur = cur
+        self.progreso = progreso
+        self.tabla = tabla
+
+        # Un trabajo reanudado continúa desde la última fila confirmada
+        crear_tabla_puntos_control(cur)
+        cur.execute(
+            f"SELECT FILAS_CONFIRMADAS FROM {TABLA_PUNTOS_CONTROL} WHERE ID_TRABAJO = %s",
+            (progreso.id_trabajo,),
+        )
+        fila = cur.fetchone()
+        self.inicial = int(fila[0]) if fila else 0
+        self.confirmadas = self.inicial
+        self.reanudado = self.inicial > 0
+        progreso.filas_confirmadas = self.inicial
+        connection.commit()
+
+    def confirmar(self, filas):
+        # Llamado después de cada lote con las filas insertadas en este intento
+        if self.inicial + filas - self.confirmadas >= FILAS_POR_CONFIRMACION:
+            self.guardar(self.inicial + filas)
+
+    def guardar(self, total):
+        # El punto de control se confirma en la misma transacción que las filas
+        self.cur.execute(
+            f"INSERT INTO {TABLA_PUNTOS_CONTROL} (ID_TRABAJO, TABLA, FILAS_CONFIRMADAS, ACTUALIZADO) "
+            "VALUES (%s, %s, %s, NOW()) "
+            "ON DUPLICATE KEY UPDATE FILAS_CONFIRMADAS = VALUES(FILAS_CONFIRMADAS), ACTUALIZADO = NOW()",
+            (self.progreso.id_trabajo, self.tabla, total),
+        )
+        with medir(self.progreso, "confirmacion"):
+            self.connection.commit()
+        self.confirmadas = total
+        self.progreso.filas_confirmadas = total
+        self.progreso.guardar(forzar=False)
 
+    def reiniciar(self):
+        self.inicial = 0
+        self.confirmadas = 0
 
-@app.route("/carga_exitosa_e_dec_planta")
-def carga_exitosa_e_dec_planta():
-    # Obtener el mensaje de la sesión
-    message = session.pop("message", None)
-    return render_template("carga_exitosa_e_dec_planta.html", message=message)
+    def borrar(self):
+        self.cur.execute(
+            f"DELETE FROM {TABLA_PUNTOS_CONTROL} WHERE ID_TRABAJO = %s", (self.progreso.id_trabajo,)
+        )
+        self.connection.commit()
+        # Sin punto de control ya no hay nada que reanudar: un error posterior
+        # (versión, informes) no debe conservar el archivo ni marcarse reanudable
+        self.progreso.filas_confirmadas = 0
 
 
-@app.route("/e_dec_planta_py_dashboard")
-def e_dec_planta_py_dashboard():
-    # return redirect("http://localhost/evaluacion_docente/dashboard/e_dec_planta_py.php")
-    return redirect(
-        "https://apps1.colmayor.edu.co/evaluacion_docente/dashboard/e_dec_planta_py.php"
+def descartar_puntos_control(cur, tabla, id_trabajo=None):
+    # Una tabla sombra nueva reemplaza la que hubiera dejado otro trabajo: sus
+    # puntos de control ya no apuntan a filas válidas y al reanudar empiezan de cero
+    crear_tabla_puntos_control(cur)
+    cur.execute(
+        f"DELETE FROM {TABLA_PUNTOS_CONTROL} WHERE TABLA = %s AND ID_TRABAJO <> %s",
+        (tabla, id_trabajo or ""),
     )
 
-    # -----------------------FUNCION CARGA DE DATOS DECANO CATEDRA ---------------------------------
 
+# -----------------------CARGA EN TABLA SOMBRA E INTERCAMBIO ATOMICO---------------------------------------
+
+# Segundos que una carga espera a que termine otra carga de la misma tabla
+ESPERA_BLOQUEO_CARGA = int(os.getenv("ESPERA_BLOQUEO_CARGA", "3600"))
 
-@app.route("/cargar_datos_e_dec_catedra", methods=["GET", "POST"])
-def cargar_datos_e_dec_catedra():
-    if request.method == "POST":
-        # Obtener el archivo Excel desde el formulario
-        archivo_excel = request.files["archivo_excel"]
 
+@contextlib.contextmanager
+def bloqueo_tabla(cur, tabla, progreso=None, espera=None):
+    # Bloqueo con nombre de MySQL: serializa las cargas y publicaciones de una
+    # tabla entre hilos, procesos de gunicorn y servidores, porque comparten
+    # la tabla sombra, los hashes y los duplicados de esa tabla
+    nombre = f"carga_{tabla}"
+    espera = ESPERA_BLOQUEO_CARGA if espera is None else espera
+    cur.execute("SELECT GET_LOCK(%s, 0)", (nombre,))
+    obtenido = cur.fetchone()[0]
+    if not obtenido and espera:
+        if progreso:
+            progreso.cambiar_fase("en_espera")
+        cur.execute("SELECT GET_LOCK(%s, %s)", (nombre, espera))
+        obtenido = cur.fetchone()[0]
+    if not obtenido:
+        raise RuntimeError(f"Otra carga de la tabla {tabla} sigue en curso; intente de nuevo más tarde")
+
+    try:
+        yield
+    finally:
+        # Si la conexión se perdió, MySQL ya liberó el bloqueo al cerrar la sesión
         try:
-            # Leer el archivo Excel
-            wb = openpyxl.load_workbook(archivo_excel)
-            hoja = wb.active
-
-            # Conectar a la base de datos
-            connection = conectar_base_datos()
-
-            if connection:
-                # Crear un cursor
-                cur = connection.cursor()
-
-                # Truncate table antes del bucle
-                truncate_query = "TRUNCATE TABLE e_decano_catedra"
-                cur.execute(truncate_query)
-
-                # Iterar sobre las filas del archivo Excel e insertar en la base de datos
-                for row in hoja.iter_rows(min_row=2, values_only=True):
-                    # Verificar y reemplazar celdas vacías con un valor por defecto
-                    row = [value if value is not None else " " for value in row]
-
-                    # Construir la consulta INSERT sin la columna autoincremental
-                    columnas = """
-                        ID_ENCUESTA_QUSUARIO, ID_DOCENTE, FACULTAD, PROGRAMA,
-                        DOCUMENTO_EVALUADOR, NOMBRE_EVALUADOR, DOCUMENTO_DOCENTE,NOMBRE_DOCENTE,
-                        CARGO_DOCENTE, ENCUESTA, FECHA_DILIGENCIAMIENTO, PREGUNTA1, PREGUNTA2,
-                        PREGUNTA3, PREGUNTA4, PREGUNTA5, PREGUNTA6, PREGUNTA7, PREGUNTA8
-                    """
-                    marcadores = ", ".join(["%s"] * len(row))
-
-                    query = (
-                        f"INSERT INTO e_decano_catedra ({columnas}) VALUES ({marcadores})"
-                    )
+            cur.execute("SELECT RELEASE_LOCK(%s)", (nombre,))
+            cur.fetchall()
+        except pymysql.Error:
+            pass
 
-                    # Ejecutar la consulta
-                    cur.execute(query, row)
 
-                # Commit y cerrar la conexión
-                connection.commit()
-                cur.close()
-                connection.close()
+def indices_secundarios(cur, tabla):
+    # Leer la definición de los índices distintos a la llave primaria
+    cur.execute(
+        """
+        SELECT INDEX_NAME, NON_UNIQUE, INDEX_TYPE, COLUMN_NAME, SUB_PART
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME <> 'PRIMARY'
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+        """,
+        (tabla,),
+    )
 
-            # Mensaje de éxito almacenado en la sesión
-            session["message"] = "Carga exitosa. Los datos se han subido correctamente."
+    indices = {}
+    for nombre, no_unico, tipo, columna, sub_parte in cur.fetchall():
+        if nombre not in indices:
+            if tipo == "FULLTEXT":
+                clase = "FULLTEXT INDEX"
+            elif not int(no_unico):
+                clase = "UNIQUE INDEX"
+            else:
+                clase = "INDEX"
+            indices[nombre] = (clase, [])
+        indices[nombre][1].append(f"`{columna}`({sub_parte})" if sub_parte else f"`{columna}`")
+    return indices
 
-            # Redirigir a la ruta carga_exitosa
-            return redirect(url_for("carga_exitosa_e_dec_catedra"))
 
-        except Exception as e:
-            # Mensaje de error almacenado en la sesión
-            session["message"] = f"Error durante la carga de datos: {str(e)}"
+def preparar_tabla_sombra(cur, tabla):
+    # Crear una copia vacía de la tabla sin índices secundarios para cargar más rápido
+    tabla_nueva = f"{tabla}_nueva"
+    cur.execute(f"DROP TABLE IF EXISTS {tabla_nueva}")
+    cur.execute(f"CREATE TABLE {tabla_nueva} LIKE {tabla}")
+
+    indices = indices_secundarios(cur, tabla_nueva)
+    if indices:
+        cur.execute(
+            f"ALTER TABLE {tabla_nueva} "
+            + ", ".join(f"DROP INDEX `{nombre}`" for nombre in indices)
+        )
+    return tabla_nueva, indices
+
+
+def crear_indices(cur, tabla_nueva, indices):
+    # Construir todos los índices en una sola pasada después de cargar los datos
+    if indices:
+        cur.execute(
+            f"ALTER TABLE {tabla_nueva} "
+            + ", ".join(
+                f"ADD {clase} `{nombre}` ({', '.join(columnas)})"
+                for nombre, (clase, columnas) in indices.items()
+            )
+        )
+
+
+def intercambiar_tablas(cur, tabla):
+    # RENAME TABLE es atómico: los lectores ven la tabla anterior o la nueva completa
+    cur.execute(f"DROP TABLE IF EXISTS {tabla}_anterior")
+    cur.execute(
+        f"RENAME TABLE {tabla} TO {tabla}_anterior, {tabla}_nueva TO {tabla}"
+    )
+
+
+def cargar_con_tabla_sombra(
+    connection, cur, esquema, ruta, progreso=None, duplicados=None, punto=None
+):
+    tabla = esquema.tabla
+
+    # Al reanudar se conserva la tabla sombra con las filas ya confirmadas; si
+    # otra carga la reemplazó entretanto se empieza de nuevo
+    if punto and punto.inicial:
+        cur.execute("SHOW TABLES LIKE %s", (esquema.tabla_sombra,))
+        if cur.fetchone() is None:
+            punto.reiniciar()
+
+    if punto and punto.inicial:
+        tabla_nueva, indices = esquema.tabla_sombra, indices_secundarios(cur, tabla)
+    else:
+        descartar_puntos_control(cur, tabla, punto.progreso.id_trabajo if punto else None)
+        tabla_nueva, indices = preparar_tabla_sombra(cur, tabla)
+
+    # Los hashes de las filas se registran durante la carga (también los de las
+    # filas ya confirmadas al reanudar) y se publican junto con la tabla
+    crear_tabla_hashes(cur)
+    cur.execute(f"DELETE FROM {TABLA_HASHES_NUEVOS} WHERE TABLA = %s", (tabla,))
+
+    try:
+        total, filas_por_segundo = cargar_filas(
+            connection, cur, esquema, ruta, progreso, duplicados, punto
+        )
+        if punto:
+            punto.guardar(total)
+        with medir(progreso, "confirmacion"):
+            connection.commit()
+        if progreso:
+            progreso.cambiar_fase("indexando")
+        with medir(progreso, "indexado"):
+            crear_indices(cur, tabla_nueva, indices)
+    except Exception as e:
+        # La tabla en uso no se modifica si la carga falla; la tabla sombra solo
+        # se conserva si tiene filas confirmadas desde las que se pueda reanudar.
+        # Un archivo con errores de validación no se puede reanudar
+        connection.rollback()
+        invalido = isinstance(e, ArchivoInvalido)
+        if invalido or not (punto and punto.confirmadas):
+            cur.execute(f"DROP TABLE IF EXISTS {tabla_nueva}")
+        if invalido and punto:
+            punto.borrar()
+        raise
+
+    if progreso:
+        progreso.cambiar_fase("publicando")
+    with medir(progreso, "publicacion"):
+        intercambiar_tablas(cur, tabla)
+        if duplicados is not None:
+            duplicados.publicar()
+
+        # La próxima carga incremental compara contra los hashes de esta carga
+        publicar_hashes(connection, cur, tabla)
+    return total, filas_por_segundo
+
+
+def restaurar_tabla_anterior(cur, tabla):
+    # Intercambiar la tabla actual con la conservada de la carga previa
+    cur.execute(
+        f"RENAME TABLE {tabla} TO {tabla}_restaurando, "
+        f"{tabla}_anterior TO {tabla}, "
+        f"{tabla}_restaurando TO {tabla}_anterior"
+    )
+
+
+@rutas.route("/restaurar_carga/<tabla>", methods=["POST"])
+def restaurar_carga(tabla):
+    if tabla not in TABLAS_CARGA:
+        return jsonify({"error": f"Tabla no permitida: {tabla}"}), 404
+
+    connection = obtener_conexion()
+    if connection is None:
+        return jsonify({"error": "Error de conexión a la base de datos"}), 503
+
+    try:
+        cur = connection.cursor()
+        with bloqueo_tabla(cur, tabla, espera=0):
+            restaurar_tabla_anterior(cur, tabla)
+            borrar_hashes(connection, cur, tabla)
+        incrementar_version(connection, cur, tabla)
+        if AGREGAR_INFORMES:
+            actualizar_informes(connection, cur)
+        cur.close()
+        return jsonify({"tabla": tabla, "restaurada": True})
+
+    except (pymysql.Error, RuntimeError) as e:
+        return jsonify({"error": f"No se pudo restaurar la tabla {tabla}: {e}"}), 409
+
+    finally:
+        # Devolver la conexión al pool
+        connection.close()
+
+
+# -----------------------CARGA INCREMENTAL POR DIFERENCIAS---------------------------------------
+
+# Columna que identifica cada respuesta en todas las encuestas
+COLUMNA_CLAVE = "ID_ENCUESTA_QUSUARIO"
+
+# Tabla auxiliar con el hash de cada fila cargada, por tabla y clave
+TABLA_HASHES = "hashes_filas_carga"
+
+# Hashes de la carga completa en curso; reemplazan los de la tabla al publicarla
+TABLA_HASHES_NUEVOS = "hashes_filas_carga_nueva"
+
+
+def crear_tabla_hashes(cur):
+    for nombre in (TABLA_HASHES, TABLA_HASHES_NUEVOS):
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {nombre} (
+                TABLA VARCHAR(64) NOT NULL,
+                {COLUMNA_CLAVE} VARCHAR(64) NOT NULL,
+                HASH_FILA BINARY(16) NOT NULL,
+                PRIMARY KEY (TABLA, {COLUMNA_CLAVE})
+            )
+            """
+        )
+
+
+def borrar_hashes(connection, cur, tabla):
+    crear_tabla_hashes(cur)
+    cur.execute(f"DELETE FROM {TABLA_HASHES} WHERE TABLA = %s", (tabla,))
+    connection.commit()
+
+
+def registrar_hashes(cur, esquema, filas):
+    # Durante la carga completa cada fila ya pasa convertida por aquí: su hash
+    # se guarda con la misma llave y el mismo cálculo que usa la incremental
+    posiciones = [esquema.lista_columnas.index(columna) for columna in columnas_llave(esquema)]
+    query = (
+        f"INSERT INTO {TABLA_HASHES_NUEVOS} (TABLA, {COLUMNA_CLAVE}, HASH_FILA) VALUES (%s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE HASH_FILA = VALUES(HASH_FILA)"
+    )
+    lote = []
+    for row in filas:
+        partes = tuple(clave_fila(row[posicion]) for posicion in posiciones)
+        lote.append((esquema.tabla, clave_almacenada(partes), hash_fila(row)))
+        if len(lote) >= TAMANO_LOTE_INSERT:
+            cur.executemany(query, lote)
+            lote = []
+        yield row
+    if lote:
+        cur.executemany(query, lote)
+
+
+def publicar_hashes(connection, cur, tabla):
+    cur.execute(f"DELETE FROM {TABLA_HASHES} WHERE TABLA = %s", (tabla,))
+    cur.execute(
+        f"INSERT INTO {TABLA_HASHES} (TABLA, {COLUMNA_CLAVE}, HASH_FILA) "
+        f"SELECT TABLA, {COLUMNA_CLAVE}, HASH_FILA FROM {TABLA_HASHES_NUEVOS} WHERE TABLA = %s",
+        (tabla,),
+    )
+    cur.execute(f"DELETE FROM {TABLA_HASHES_NUEVOS} WHERE TABLA = %s", (tabla,))
+    connection.commit()
+
+
+def clave_fila(value):
+    # Excel entrega a veces los identificadores como float (123.0)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def hash_fila(row):
+    contenido = "\x1f".join(str(value) for value in row)
+    return hashlib.blake2b(contenido.encode("utf-8"), digest_size=16).digest()
 
-    # Redirigir en caso de no ser un método POST o en caso de carga exitosa
-    return redirect(url_for("e_dec_catedra_py_dashboard"))
 
+def clave_almacenada(partes):
+    # Las llaves compuestas se guardan como hash para caber en la columna de
+    # la tabla de hashes; las simples se guardan tal cual
+    if len(partes) == 1:
+        return partes[0]
+    return hashlib.blake2b("\x1f".join(partes).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def hashes_almacenados(connection, esquema, columnas):
+    tabla = esquema.tabla
+
+    # Leer con un cursor sin búfer para no duplicar en memoria el resultado
+    cur = connection.cursor(pymysql.cursors.SSCursor)
+    try:
+        cur.execute(
+            f"SELECT {COLUMNA_CLAVE}, HASH_FILA FROM {TABLA_HASHES} WHERE TABLA = %s",
+            (tabla,),
+        )
+        hashes = {clave: valor for clave, valor in cur}
+
+        # Toda llave presente en la tabla existe, tenga o no hash (filas de una
+        # carga completa o ausentes en una incremental anterior): sin hash se
+        # reemplaza una vez en lugar de insertarse repetida. Una llave que ya
+        # está repetida en la tabla también se reemplaza para dejar una sola fila
+        cur.execute(f"SELECT {', '.join(columnas)} FROM {tabla}")
+        almacenados = {}
+        for fila in cur:
+            clave = clave_almacenada(tuple(clave_fila(value) for value in fila))
+            almacenados[clave] = None if clave in almacenados else hashes.pop(clave, None)
+    finally:
+        cur.close()
+
+    # Los hashes restantes no tienen fila en la tabla y ya no sirven
+    return almacenados, list(hashes)
+
+
+def partes_por_clave(connection, tabla, columnas, claves):
+    # Valores de las llaves a eliminar; las compuestas solo se guardan como
+    # hash, así que se recuperan releyendo las llaves de la tabla
+    if len(columnas) == 1:
+        return [(clave,) for clave in claves]
+
+    buscadas = set(claves)
+    cur = connection.cursor(pymysql.cursors.SSCursor)
+    try:
+        cur.execute(f"SELECT {', '.join(columnas)} FROM {tabla}")
+        partes = {}
+        for fila in cur:
+            valores = tuple(clave_fila(value) for value in fila)
+            if clave_almacenada(valores) in buscadas:
+                partes[valores] = None
+    finally:
+        cur.close()
+    return list(partes)
+
+
+def condicion_llave(columnas, llaves):
+    # Condición IN sobre una columna o sobre una llave compuesta:
+    # (A, B) IN ((%s, %s), ...)
+    if len(columnas) == 1:
+        return f"{columnas[0]} IN ({', '.join(['%s'] * len(llaves))})", [llave[0] for llave in llaves]
+    fila = "(" + ", ".join(["%s"] * len(columnas)) + ")"
+    return (
+        f"({', '.join(columnas)}) IN ({', '.join([fila] * len(llaves))})",
+        [parte for llave in llaves for parte in llave],
+    )
+
+
+def docentes_por_clave(cur, esquema, columnas, llaves):
+    # Docentes de las filas que se van a reemplazar o eliminar
+    if not llaves:
+        return set()
+    condicion, parametros = condicion_llave(columnas, llaves)
+    cur.execute(f"SELECT DISTINCT {COLUMNA_DOCENTE} FROM {esquema.tabla} WHERE {condicion}", parametros)
+    return {clave_fila(docente) for (docente,) in cur.fetchall()}
+
+
+def borrar_por_llave(cur, tabla, columnas, llaves):
+    if llaves:
+        condicion, parametros = condicion_llave(columnas, llaves)
+        cur.execute(f"DELETE FROM {tabla} WHERE {condicion}", parametros)
+
+
+def borrar_por_clave(cur, tabla, columna_clave, claves):
+    borrar_por_llave(cur, tabla, (columna_clave,), [(clave,) for clave in claves])
+
+
+def borrar_hashes_por_clave(cur, tabla, claves):
+    for i in range(0, len(claves), TAMANO_LOTE_INSERT):
+        lote = claves[i : i + TAMANO_LOTE_INSERT]
+        marcadores = ", ".join(["%s"] * len(lote))
+        cur.execute(
+            f"DELETE FROM {TABLA_HASHES} WHERE TABLA = %s AND {COLUMNA_CLAVE} IN ({marcadores})",
+            [tabla] + lote,
+        )
+
+
+def cargar_incremental(
+    connection, cur, esquema, ruta, eliminar_faltantes=False, progreso=None, duplicados=None,
+    punto=None,
+):
+    tabla = esquema.tabla
+
+    # Las filas se identifican por la misma llave que usa el detector de
+    # duplicados (por ejemplo DOCUMENTO_DOCENTE + GRUPO + ID_ENCUESTA_QUSUARIO)
+    columnas = columnas_llave(esquema)
+    posiciones = [esquema.lista_columnas.index(columna) for columna in columnas]
+    query_hashes = (
+        f"INSERT INTO {TABLA_HASHES} (TABLA, {COLUMNA_CLAVE}, HASH_FILA) VALUES (%s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE HASH_FILA = VALUES(HASH_FILA)"
+    )
+
+    crear_tabla_hashes(cur)
+    ajustar_tamano_sentencia(cur)
+    with medir(progreso, "lectura_hashes"):
+        almacenados, huerfanos = hashes_almacenados(connection, esquema, columnas)
+    borrar_hashes_por_clave(cur, tabla, huerfanos)
+
+    # La carga incremental siempre relee el archivo completo
+    if punto:
+        punto.reiniciar()
+
+    inicio = time.perf_counter()
+    resumen = {"insertadas": 0, "actualizadas": 0, "sin_cambios": 0, "eliminadas": 0, "repetidas": 0}
+    vistas = set()
+
+    # Docentes con filas nuevas, modificadas o eliminadas, para recalcular sus informes
+    docentes = set()
+    filas_lote, claves_cambiadas, hashes_lote = [], [], []
+
+    def enviar_lote():
+        # Las filas modificadas se reemplazan (DELETE + INSERT) para enviarlas
+        # en el mismo INSERT multi-fila que las nuevas
+        with medir(progreso, "insercion"):
+            docentes.update(docentes_por_clave(cur, esquema, columnas, claves_cambiadas))
+            borrar_por_llave(cur, tabla, columnas, claves_cambiadas)
+            if filas_lote:
+                cur.executemany(esquema.query_insert, filas_lote)
+                cur.executemany(query_hashes, hashes_lote)
+        filas_lote.clear()
+        claves_cambiadas.clear()
+        hashes_lote.clear()
+
+        # Confirmar periódicamente: al reanudar, las filas ya confirmadas tienen
+        # su hash guardado y se omiten como filas sin cambios
+        if punto:
+            punto.confirmar(len(vistas))
+
+    if progreso:
+        progreso.cambiar_fase("cargando")
+
+    for row in filas_del_archivo(ruta, esquema, progreso, duplicados):
+        partes = tuple(clave_fila(row[posicion]) for posicion in posiciones)
+        clave = clave_almacenada(partes)
+
+        # Una llave repetida dentro del mismo archivo conserva la primera
+        # aparición; con el detector de duplicados activo no llegan repetidas
+        if clave in vistas:
+            resumen["repetidas"] += 1
+            continue
+        vistas.add(clave)
+
+        hash_nuevo = hash_fila(row)
+        if clave not in almacenados:
+            resumen["insertadas"] += 1
+        elif almacenados.pop(clave) != hash_nuevo:
+            resumen["actualizadas"] += 1
+            claves_cambiadas.append(partes)
+        else:
+            resumen["sin_cambios"] += 1
+            continue
+
+        filas_lote.append(row)
+        docentes.add(clave_fila(row[esquema.posicion_docente]))
+        hashes_lote.append((tabla, clave, hash_nuevo))
+        if len(filas_lote) >= TAMANO_LOTE_INSERT:
+            enviar_lote()
+
+    enviar_lote()
+
+    # Las claves que quedan en almacenados no vinieron en el archivo
+    if eliminar_faltantes and almacenados:
+        faltantes = partes_por_clave(connection, tabla, columnas, list(almacenados))
+        for i in range(0, len(faltantes), TAMANO_LOTE_INSERT):
+            lote = faltantes[i : i + TAMANO_LOTE_INSERT]
+            docentes.update(docentes_por_clave(cur, esquema, columnas, lote))
+            borrar_por_llave(cur, tabla, columnas, lote)
+        borrar_hashes_por_clave(cur, tabla, list(almacenados))
+        resumen["eliminadas"] = len(faltantes)
+
+    # Los duplicados se publican en la misma transacción que los cambios
+    if duplicados is not None:
+        duplicados.publicar()
+
+    with medir(progreso, "confirmacion"):
+        connection.commit()
+
+    segundos = time.perf_counter() - inicio
+    procesadas = len(vistas)
+    resumen["filas_por_segundo"] = procesadas / segundos if segundos > 0 else float(procesadas)
+    registrar_evento("carga_incremental", tabla=tabla, segundos=round(segundos, 2), **resumen)
+    resumen["docentes"] = docentes
+    return resumen
+
+
+def mensaje_carga_incremental(resumen):
+    mensaje = (
+        "Carga incremental exitosa. "
+        f"Insertadas: {resumen['insertadas']}, actualizadas: {resumen['actualizadas']}, "
+        f"sin cambios: {resumen['sin_cambios']}, eliminadas: {resumen['eliminadas']} "
+        f"({resumen['filas_por_segundo']:.0f} filas/s)"
+    )
+    if resumen["repetidas"]:
+        mensaje += f" Filas con llave repetida omitidas: {resumen['repetidas']}."
+    return mensaje
+
+
+def ejecutar_carga(
+    connection, cur, esquema, ruta, modo="completa", eliminar_faltantes=False, progreso=None
+):
+    # Una sola carga por tabla a la vez; el punto de control se lee ya con el
+    # bloqueo tomado para que ninguna otra carga cambie la tabla sombra
+    with bloqueo_tabla(cur, esquema.tabla, progreso):
+        # Punto de control para confirmar por bloques y reanudar si la carga falla
+        punto = PuntoControl(connection, cur, progreso, esquema.tabla) if progreso else None
+
+        # Carga incremental por diferencias o reemplazo completo mediante tabla sombra;
+        # se devuelven los docentes afectados (None cuando puede ser cualquiera)
+        duplicados = None
+        if DETECTAR_DUPLICADOS:
+            # Cada carga relee el archivo completo, así que sus duplicados reemplazan
+            # los registrados antes para la tabla en lugar de acumularse
+            id_trabajo = progreso.id_trabajo if progreso else uuid.uuid4().hex
+            duplicados = DetectorDuplicados(cur, esquema, ruta, id_trabajo)
+
+        try:
+            if modo == "incremental":
+                resumen = cargar_incremental(
+                    connection, cur, esquema, ruta, eliminar_faltantes, progreso, duplicados, punto
+                )
+                mensaje = mensaje_carga_incremental(resumen)
+
+                # Los docentes de un intento anterior ya confirmado no se conocen
+                docentes = None if punto and punto.reanudado else resumen["docentes"]
+            else:
+                total, filas_por_segundo = cargar_con_tabla_sombra(
+                    connection, cur, esquema, ruta, progreso, duplicados, punto
+                )
+                mensaje = mensaje_carga_exitosa(total, filas_por_segundo)
+                docentes = None
+        except Exception:
+            if duplicados is not None:
+                duplicados.descartar(connection)
+            raise
+
+        if punto:
+            punto.borrar()
+
+        # Invalidar las exportaciones en caché que dependen de esta tabla
+        incrementar_version(connection, cur, esquema.tabla)
+        if duplicados is not None:
+            incrementar_version(connection, cur, TABLA_DUPLICADOS)
+            if duplicados.total:
+                mensaje += f" Duplicados separados ({duplicados.politica} aparición conservada): {duplicados.total}."
+        return mensaje, docentes
+
+
+def opciones_carga(formulario):
+    modo = formulario.get("modo_carga", "completa")
+    eliminar_faltantes = formulario.get("eliminar_faltantes") in ("1", "on", "true")
+    return modo, eliminar_faltantes
+
+
+def mensaje_carga_exitosa(total, filas_por_segundo):
+    return (
+        "Carga exitosa. Los datos se han subido correctamente. "
+        f"({total} filas, {filas_por_segundo:.0f} filas/s)"
+    )
+
+
+# -----------------------EXPORTACION EN STREAMING A EXCEL---------------------------------------
+
+# Filas que se leen del cursor del servidor en cada bloque
+TAMANO_BLOQUE_EXPORTACION = int(os.getenv("TAMANO_BLOQUE_EXPORTACION", "2000"))
+
+MIMETYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Caracteres de control que no se permiten dentro de un XML
+CARACTERES_ILEGALES_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+# Origen de las fechas seriales de Excel
+ORIGEN_FECHAS_EXCEL = datetime.datetime(1899, 12, 30)
+
+XLSX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>"""
+
+XLSX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+XLSX_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+XLSX_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+# Estilos: 0 general, 1 fecha, 2 fecha y hora
+XLSX_STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="3">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+</cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+
+XLSX_INICIO_HOJA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    "<sheetData>"
+)
+
+XLSX_FIN_HOJA = "</sheetData></worksheet>"
+
+
+class SalidaStreaming:
+    # Destino no posicionable para zipfile: acumula los bytes comprimidos
+    # hasta que el generador de la respuesta los entrega al cliente
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def celda_xlsx(value):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, decimal.Decimal)):
+        return f"<c><v>{value}</v></c>"
+    if isinstance(value, float):
+        return f"<c><v>{value!r}</v></c>" if math.isfinite(value) else "<c/>"
+    if isinstance(value, datetime.datetime):
+        serial = (value.replace(tzinfo=None) - ORIGEN_FECHAS_EXCEL).total_seconds() / 86400
+        return f'<c s="2"><v>{serial!r}</v></c>'
+    if isinstance(value, datetime.date):
+        return f'<c s="1"><v>{(value - ORIGEN_FECHAS_EXCEL.date()).days}</v></c>'
+    if isinstance(value, (bytes, bytearray)):
+        value = bytes(value).decode("utf-8", errors="replace")
+
+    texto = escape(CARACTERES_ILEGALES_XML.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def fila_xlsx(row):
+    return "<row>" + "".join(celda_xlsx(value) for value in row) + "</row>"
+
+
+def generar_xlsx(encabezados, bloques):
+    # Escribir el libro directamente como ZIP en streaming: cada bloque de filas
+    # se comprime y se entrega al cliente sin esperar al final del archivo
+    salida = SalidaStreaming()
+    with zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED) as libro:
+        libro.writestr("[Content_Types].xml", XLSX_CONTENT_TYPES)
+        libro.writestr("_rels/.rels", XLSX_RELS)
+        libro.writestr("xl/workbook.xml", XLSX_WORKBOOK)
+        libro.writestr("xl/_rels/workbook.xml.rels", XLSX_WORKBOOK_RELS)
+        libro.writestr("xl/styles.xml", XLSX_STYLES)
+        yield salida.vaciar()
+
+        with libro.open("xl/worksheets/sheet1.xml", "w") as hoja:
+            hoja.write((XLSX_INICIO_HOJA + fila_xlsx(encabezados)).encode("utf-8"))
+            for bloque in bloques:
+                hoja.write("".join(fila_xlsx(row) for row in bloque).encode("utf-8"))
+                datos = salida.vaciar()
+                if datos:
+                    yield datos
+            hoja.write(XLSX_FIN_HOJA.encode("utf-8"))
+
+    yield salida.vaciar()
+
+
+def leer_bloques(cur, tamano_bloque=None):
+    tamano_bloque = tamano_bloque or TAMANO_BLOQUE_EXPORTACION
+    while True:
+        bloque = cur.fetchmany(tamano_bloque)
+        if not bloque:
+            break
+        yield bloque
+
+
+def generar_excel(descripcion, cur):
+    yield from generar_xlsx([columna[0] for columna in descripcion], leer_bloques(cur))
+
+
+# -----------------------EXPORTACION EN CSV, CSV COMPRIMIDO Y PARQUET---------------------------------------
+
+# Filas por grupo de filas (row group) en los archivos Parquet
+TAMANO_GRUPO_PARQUET = int(os.getenv("TAMANO_GRUPO_PARQUET", "50000"))
+
+TIPOS_ENTEROS_MYSQL = (
+    FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG,
+    FIELD_TYPE.LONGLONG, FIELD_TYPE.INT24, FIELD_TYPE.YEAR,
+)
+TIPOS_TEXTO_MYSQL = (
+    FIELD_TYPE.STRING, FIELD_TYPE.VAR_STRING, FIELD_TYPE.VARCHAR, FIELD_TYPE.TINY_BLOB,
+    FIELD_TYPE.MEDIUM_BLOB, FIELD_TYPE.LONG_BLOB, FIELD_TYPE.BLOB,
+)
+
+# Juego de caracteres "binary": PyMySQL entrega esas columnas como bytes
+CHARSET_BINARIO = 63
+
+
+def campos_resultado(cur):
+    # Metadatos completos de las columnas (flags, juego de caracteres), que no
+    # vienen en cursor.description
+    return getattr(getattr(cur, "_result", None), "fields", None) or []
+
+
+def decodificar_binario(value):
+    return value.decode("utf-8", errors="replace") if isinstance(value, (bytes, bytearray)) else value
+
+
+def entero_bit(value):
+    return int.from_bytes(value, "big") if isinstance(value, (bytes, bytearray)) else value
+
+
+def conversores_binarios(cur):
+    # Columnas que llegan como bytes: BIT se exporta como número y las binarias
+    # (BLOB, VARBINARY) como texto UTF-8 en lugar de su repr b'...'
+    conversores = {}
+    for posicion, campo in enumerate(campos_resultado(cur)):
+        if campo.type_code == FIELD_TYPE.BIT:
+            conversores[posicion] = entero_bit
+        elif campo.type_code in TIPOS_TEXTO_MYSQL and campo.charsetnr == CHARSET_BINARIO:
+            conversores[posicion] = decodificar_binario
+    return conversores
+
+
+def generar_csv(descripcion, cur, comprimir=False):
+    # wbits=31 produce un flujo gzip completo (cabecera y CRC incluidos)
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31) if comprimir else None
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    def vaciar_buffer():
+        datos = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compresor.compress(datos) if compresor else datos
+
+    # BOM para que Excel reconozca el CSV como UTF-8
+    buffer.write("\ufeff")
+    escritor.writerow([columna[0] for columna in descripcion])
+    yield vaciar_buffer()
+
+    conversores = conversores_binarios(cur)
+    for bloque in leer_bloques(cur):
+        if conversores:
+            bloque = [
+                [conversores[i](value) if i in conversores else value for i, value in enumerate(row)]
+                for row in bloque
+            ]
+        escritor.writerows(bloque)
+        datos = vaciar_buffer()
+        if datos:
+            yield datos
+
+    if compresor:
+        yield compresor.flush()
+
+
+def generar_csv_gzip(descripcion, cur):
+    return generar_csv(descripcion, cur, comprimir=True)
+
+
+class SalidaStreamingPosicionada(SalidaStreaming):
+    # pyarrow necesita conocer la posición actual del archivo que escribe
+
+    def __init__(self):
+        super().__init__()
+        self.posicion = 0
+        self.closed = False
+
+    def write(self, datos):
+        self.posicion += len(datos)
+        return super().write(datos)
+
+    def tell(self):
+        return self.posicion
+
+    def close(self):
+        self.closed = True
+
+
+def tipo_arrow(pa, tipo_mysql, sin_signo=False):
+    # Un BIGINT UNSIGNED no cabe en int64
+    if tipo_mysql in TIPOS_ENTEROS_MYSQL:
+        return pa.uint64() if sin_signo else pa.int64()
+    if tipo_mysql == FIELD_TYPE.BIT:
+        return pa.int64()
+    if tipo_mysql in (FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE, FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL):
+        return pa.float64()
+    if tipo_mysql in (FIELD_TYPE.DATE, FIELD_TYPE.NEWDATE):
+        return pa.date32()
+    if tipo_mysql in (FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP):
+        return pa.timestamp("us")
+    return pa.string()
+
+
+def columna_arrow(pa, valores, tipo):
+    # Ajustar los valores de MySQL al tipo de la columna en el esquema. Las
+    # fechas cero (0000-00-00) llegan como texto y se exportan vacías: un valor
+    # inválido haría fallar el archivo con la respuesta ya empezada
+    if pa.types.is_integer(tipo):
+        valores = [entero_bit(value) for value in valores]
+    elif pa.types.is_date(tipo):
+        valores = [
+            value.date() if isinstance(value, datetime.datetime)
+            else value if isinstance(value, datetime.date) else None
+            for value in valores
+        ]
+    elif pa.types.is_timestamp(tipo):
+        valores = [
+            value if isinstance(value, datetime.datetime)
+            else datetime.datetime.combine(value, datetime.time()) if isinstance(value, datetime.date)
+            else None
+            for value in valores
+        ]
+    elif pa.types.is_floating(tipo):
+        valores = [float(value) if value is not None else None for value in valores]
+    elif pa.types.is_string(tipo):
+        valores = [
+            value.decode("utf-8", errors="replace") if isinstance(value, (bytes, bytearray))
+            else str(value) if value is not None else None
+            for value in valores
+        ]
+    return pa.array(valores, type=tipo)
+
+
+def generar_parquet(descripcion, cur):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Esquema fijo a partir de los tipos de MySQL para que todos los grupos coincidan
+    campos = campos_resultado(cur)
+    sin_signo = [bool(campo.flags & FLAG.UNSIGNED) for campo in campos] or [False] * len(descripcion)
+    esquema = pa.schema(
+        [(columna[0], tipo_arrow(pa, columna[1], sin_signo[i])) for i, columna in enumerate(descripcion)]
+    )
+    salida = SalidaStreamingPosicionada()
+    escritor = pq.ParquetWriter(salida, esquema, compression="snappy")
+
+    for bloque in leer_bloques(cur, TAMANO_GRUPO_PARQUET):
+        valores = list(zip(*bloque))
+        escritor.write_table(
+            pa.Table.from_arrays(
+                [columna_arrow(pa, valores[i], campo.type) for i, campo in enumerate(esquema)],
+                schema=esquema,
+            )
+        )
+        yield salida.vaciar()
+
+    escritor.close()
+    yield salida.vaciar()
+
+
+# Formato: (extensión, tipo MIME, generador)
+FORMATOS_EXPORTACION = {
+    "xlsx": (".xlsx", MIMETYPE_XLSX, generar_excel),
+    "csv": (".csv", "text/csv; charset=utf-8", generar_csv),
+    "csv.gz": (".csv.gz", "application/gzip", generar_csv_gzip),
+    "parquet": (".parquet", "application/vnd.apache.parquet", generar_parquet),
+}
+
+
+class CursorMedido:
+    # Cursor que acumula en el cronómetro el tiempo de lectura de las filas
+    def __init__(self, cur, cronometro):
+        self.cur = cur
+        self.cronometro = cronometro
+        self.filas = 0
+
+    def fetchmany(self, tamano):
+        with self.cronometro.etapa("lectura"):
+            bloque = self.cur.fetchmany(tamano)
+        self.filas += len(bloque)
+        return bloque
+
+    def __getattr__(self, nombre):
+        return getattr(self.cur, nombre)
+
+
+def generar_desde_consulta(connection, query, parametros, generador_formato, **etiquetas):
+    cronometro = CronometroEtapas()
+    inicio = time.perf_counter()
+
+    # Cursor del lado del servidor: las filas llegan por bloques en lugar de
+    # cargar todo el resultado en memoria
+    cur = connection.cursor(pymysql.cursors.SSCursor)
+    try:
+        with cronometro.etapa("consulta"):
+            cur.execute(query, parametros)
+        descripcion = cur.description
+    except Exception:
+        cur.close()
+        connection.close()
+        raise
+
+    def generar():
+        cursor_medido = CursorMedido(cur, cronometro)
+        total_bytes = 0
+        completo = False
+        try:
+            # El tiempo de escritura excluye la lectura de filas, que se mide aparte
+            for datos in cronometro.medir_filas("escritura", generador_formato(descripcion, cursor_medido)):
+                total_bytes += len(datos)
+                yield datos
+            completo = True
+        finally:
+            # La conexión se devuelve al pool cuando termina (o se corta) la descarga
+            cur.close()
+            connection.close()
+            registrar_metricas_exportacion(
+                cronometro, cursor_medido.filas, total_bytes, time.perf_counter() - inicio, completo, etiquetas
+            )
+
+    return generar()
+
+
+def registrar_metricas_exportacion(cronometro, filas, total_bytes, segundos, completo, etiquetas):
+    for etapa, segundos_etapa in cronometro.etapas.items():
+        metricas.observar("exportacion_etapa_segundos", segundos_etapa, etapa=etapa, **etiquetas)
+    metricas.incrementar("exportacion_filas_total", filas, **etiquetas)
+    metricas.incrementar("exportacion_bytes_total", total_bytes, **etiquetas)
+
+    registrar_evento(
+        "exportacion",
+        resultado="ok" if completo else "interrumpida",
+        filas=filas,
+        bytes=total_bytes,
+        segundos=round(segundos, 3),
+        etapas={etapa: round(valor, 3) for etapa, valor in cronometro.etapas.items()},
+        **etiquetas,
+    )
+
+
+# -----------------------CACHE DE INFORMES GENERADOS---------------------------------------
+
+# Directorio y tamaño máximo de la caché de archivos exportados
+DIRECTORIO_CACHE_INFORMES = os.getenv("DIRECTORIO_CACHE_INFORMES") or os.path.join(
+    tempfile.gettempdir(), "cache_informes"
+)
+CACHE_INFORMES_MAX_BYTES = int(os.getenv("CACHE_INFORMES_MAX_MB", "500")) * 1024 * 1024
+
+# Segundos durante los que se reutiliza la versión leída de una tabla sin consultar MySQL
+CACHE_VERSION_SEGUNDOS = float(os.getenv("CACHE_VERSION_SEGUNDOS", "5"))
+
+# Contador de versión por tabla, incrementado por los cargadores
+TABLA_VERSIONES = "versiones_datos"
+
+versiones_en_memoria = {}
+bloqueo_versiones = threading.Lock()
+
+
+def crear_tabla_versiones(cur):
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_VERSIONES} (
+            TABLA VARCHAR(64) NOT NULL PRIMARY KEY,
+            VERSION BIGINT NOT NULL DEFAULT 0
+        )
+        """
+    )
+
+
+def incrementar_version(connection, cur, tabla):
+    crear_tabla_versiones(cur)
+    cur.execute(
+        f"INSERT INTO {TABLA_VERSIONES} (TABLA, VERSION) VALUES (%s, 1) "
+        "ON DUPLICATE KEY UPDATE VERSION = VERSION + 1",
+        (tabla,),
+    )
+    connection.commit()
+
+    with bloqueo_versiones:
+        versiones_en_memoria.pop(tabla, None)
+
+
+def consultar_version(cur, tabla):
+    # En MySQL 8 las estadísticas de information_schema se cachean; se pide el valor actual.
+    # CREATE_TIME y UPDATE_TIME están en la hora local del servidor: UNIX_TIMESTAMP
+    # los convierte con la zona horaria de la sesión a un instante sin ambigüedad
+    try:
+        cur.execute("SET SESSION information_schema_stats_expiry = 0")
+    except pymysql.Error:
+        pass
+
+    # Solo lectura: la tabla de versiones la crea el primer cargador que
+    # incrementa un contador; mientras no exista el contador vale 0
+    query = """
+        SELECT UNIX_TIMESTAMP(t.CREATE_TIME), UNIX_TIMESTAMP(t.UPDATE_TIME), {version}
+        FROM information_schema.TABLES t {relacion}
+        WHERE t.TABLE_SCHEMA = DATABASE() AND t.TABLE_NAME = %s
+        """
+    try:
+        cur.execute(
+            query.format(
+                version="COALESCE(v.VERSION, 0)",
+                relacion=f"LEFT JOIN {TABLA_VERSIONES} v ON v.TABLA = t.TABLE_NAME",
+            ),
+            (tabla,),
+        )
+    except pymysql.ProgrammingError as e:
+        if e.args[0] != ER.NO_SUCH_TABLE:
+            raise
+        cur.execute(query.format(version="0", relacion=""), (tabla,))
+    fila = cur.fetchone()
+    return "|".join(str(value) for value in fila) if fila else ""
+
+
+def version_datos(tabla):
+    # La versión cambia cuando la tabla se recrea (intercambio), se modifica
+    # (UPDATE_TIME) o un cargador incrementa su contador
+    ahora = time.monotonic()
+    with bloqueo_versiones:
+        guardada = versiones_en_memoria.get(tabla)
+    if guardada and guardada[1] > ahora:
+        return guardada[0]
+
+    connection = obtener_conexion()
+    if connection is None:
+        return None
+
+    try:
+        cur = connection.cursor()
+        version = consultar_version(cur, tabla)
+        cur.close()
+    finally:
+        connection.close()
+
+    with bloqueo_versiones:
+        versiones_en_memoria[tabla] = (version, ahora + CACHE_VERSION_SEGUNDOS)
+    return version
+
+
+def etag_exportacion(tabla, query, version, extension):
+    return hashlib.sha1(f"{tabla}|{query}|{version}|{extension}".encode("utf-8")).hexdigest()
+
+
+def ruta_cache_exportacion(tabla, etag, extension):
+    os.makedirs(DIRECTORIO_CACHE_INFORMES, exist_ok=True)
+    return os.path.join(DIRECTORIO_CACHE_INFORMES, f"{tabla}-{etag}{extension}")
+
+
+def podar_cache():
+    # Política LRU: se eliminan los archivos usados hace más tiempo hasta
+    # quedar por debajo del tamaño máximo
+    archivos = []
+    for nombre in os.listdir(DIRECTORIO_CACHE_INFORMES):
+        ruta = os.path.join(DIRECTORIO_CACHE_INFORMES, nombre)
+        if nombre.endswith(".parcial") or not os.path.isfile(ruta):
+            continue
+        # Otro trabajador puede haber podado el archivo entre listdir y stat
+        with contextlib.suppress(FileNotFoundError):
+            estado = os.stat(ruta)
+            archivos.append((estado.st_mtime, estado.st_size, ruta))
+
+    total = sum(tamano for _, tamano, _ in archivos)
+    for _, tamano, ruta in sorted(archivos):
+        if total <= CACHE_INFORMES_MAX_BYTES:
+            break
+        with contextlib.suppress(FileNotFoundError):
+            eliminar_archivo_temporal(ruta)
+        total -= tamano
+
+
+def guardar_en_cache(generador, ruta_cache):
+    # Copiar a disco lo que se envía al cliente; el archivo solo se publica en
+    # la caché si la generación termina completa
+    fd, ruta_parcial = tempfile.mkstemp(suffix=".parcial", dir=DIRECTORIO_CACHE_INFORMES)
+    completo = False
+    try:
+        with os.fdopen(fd, "wb") as destino:
+            for datos in generador:
+                destino.write(datos)
+                yield datos
+        os.replace(ruta_parcial, ruta_cache)
+        completo = True
+        podar_cache()
+    finally:
+        generador.close()
+        if not completo:
+            eliminar_archivo_temporal(ruta_parcial)
+
+
+# Parámetros de la descarga que no son filtros por columna
+PARAMETROS_EXPORTACION = ("formato", "columnas")
+
+columnas_en_memoria = {}
+
+
+def columnas_tabla(tabla, version):
+    # Las columnas solo se vuelven a leer cuando cambia la versión de la tabla
+    guardadas = columnas_en_memoria.get(tabla)
+    if guardadas and guardadas[0] == version:
+        return guardadas[1]
+
+    connection = obtener_conexion()
+    if connection is None:
+        return None
+
+    try:
+        cur = connection.cursor()
+        cur.execute(
+            """
+            SELECT COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            ORDER BY ORDINAL_POSITION
+            """,
+            (tabla,),
+        )
+        columnas = [fila[0] for fila in cur.fetchall()]
+        cur.close()
+    finally:
+        connection.close()
+
+    columnas_en_memoria[tabla] = (version, columnas)
+    return columnas
+
+
+def filtros_consulta(columnas_disponibles, argumentos, ignorados, permitidos=None):
+    # Proyección y filtros se llevan al SQL; los nombres se validan contra las
+    # columnas reales de la tabla y los valores viajan como parámetros.
+    # Con permitidos solo se acepta filtrar por esas columnas
+    disponibles = {columna.upper(): columna for columna in columnas_disponibles}
+
+    pedidas = None
+    if argumentos.get("columnas"):
+        nombres = separar_columnas(argumentos["columnas"])
+        desconocidas = [columna for columna in nombres if columna.upper() not in disponibles]
+        if desconocidas:
+            raise ValueError(f"Columnas desconocidas: {', '.join(desconocidas)}")
+        pedidas = [disponibles[columna.upper()] for columna in nombres]
+
+    condiciones = []
+    parametros = []
+    for nombre in sorted(argumentos.keys()):
+        if nombre in ignorados:
+            continue
+        if permitidos is not None and nombre.upper() not in permitidos:
+            raise ValueError(f"Filtro no permitido: {nombre} (use {', '.join(permitidos)})")
+        if nombre.upper() not in disponibles:
+            raise ValueError(f"Filtro desconocido: {nombre}")
+
+        valores = argumentos.getlist(nombre)
+        columna = f"`{disponibles[nombre.upper()]}`"
+        if len(valores) == 1:
+            condiciones.append(f"{columna} = %s")
+        else:
+            condiciones.append(f"{columna} IN ({', '.join(['%s'] * len(valores))})")
+        parametros.extend(valores)
+
+    return pedidas, condiciones, parametros
+
+
+def construir_consulta(tabla, columnas_disponibles, argumentos):
+    pedidas, condiciones, parametros = filtros_consulta(
+        columnas_disponibles, argumentos, PARAMETROS_EXPORTACION
+    )
+    seleccion = ", ".join(f"`{columna}`" for columna in pedidas) if pedidas else "*"
+
+    query = f"SELECT {seleccion} FROM {tabla}"
+    if condiciones:
+        query += " WHERE " + " AND ".join(condiciones)
+    return query, tuple(parametros)
+
+
+def descargar_tabla(tabla, nombre_base):
+    formato = request.args.get("formato", "xlsx")
+    if formato not in FORMATOS_EXPORTACION:
+        return f"Formato no soportado: {formato}", 400
+    if formato == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        return "El formato parquet requiere el paquete pyarrow", 400
+    extension, mimetype, generador_formato = FORMATOS_EXPORTACION[formato]
+
+    version = version_datos(tabla)
+    columnas_disponibles = columnas_tabla(tabla, version) if version is not None else None
+    if columnas_disponibles is None:
+        return "Error de conexión a la base de datos"
+    # La tabla aún no existe (p. ej. duplicados_carga antes de la primera carga)
+    if not columnas_disponibles:
+        return f"La tabla {tabla} todavía no existe: aún no hay datos para exportar", 404
+
+    try:
+        query, parametros = construir_consulta(tabla, columnas_disponibles, request.args)
+    except ValueError as e:
+        return str(e), 400
+
+    # Si el cliente ya tiene esta versión se responde 304 sin regenerar nada
+    etag = etag_exportacion(tabla, f"{query}|{parametros}", version, extension)
+    if request.if_none_match.contains(etag):
+        metricas.incrementar("exportacion_cache_total", tabla=tabla, formato=formato, resultado="no_modificado")
+        return Response(status=304, headers={"ETag": f'"{etag}"'})
+
+    nombre_descarga = f"{nombre_base}{extension}"
+
+    # Servir el archivo desde la caché en disco si ya fue generado
+    ruta_cache = ruta_cache_exportacion(tabla, etag, extension)
+    if os.path.exists(ruta_cache):
+        os.utime(ruta_cache)
+        metricas.incrementar("exportacion_cache_total", tabla=tabla, formato=formato, resultado="acierto")
+        return send_file(
+            ruta_cache,
+            as_attachment=True,
+            download_name=nombre_descarga,
+            mimetype=mimetype,
+            etag=etag,
+            max_age=0,
+        )
+
+    # Conectar a la base de datos
+    connection = obtener_conexion()
+    if connection is None:
+        return "Error de conexión a la base de datos"
+
+    # Enviar el archivo al usuario a medida que se genera y guardarlo en la caché
+    metricas.incrementar("exportacion_cache_total", tabla=tabla, formato=formato, resultado="fallo")
+    generador = generar_desde_consulta(
+        connection, query, parametros, generador_formato, tabla=tabla, formato=formato
+    )
+    return Response(
+        guardar_en_cache(generador, ruta_cache),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f'attachment; filename="{nombre_descarga}"',
+            "ETag": f'"{etag}"',
+            "Cache-Control": "no-cache",
+        },
+    )
+
+
+# -------------------------------FUNCION PARA DESCARGAR EXCEL-------------------------------------------
+@rutas.route("/descargar_informe_final")
+def descargar_informe_final():
+    # Exportar informes_finales con los filtros, columnas y formato pedidos
+    # (por defecto la tabla completa en Excel)
+    return descargar_tabla("informes_finales", "Informes Finales")
+
+# -------------------------------FUNCION PARA DESCARGAR EXCEL-------------------------------------------
+@rutas.route("/descargar_informe_final_duplicados")
+def descargar_informe_final_duplicados():
+    # Exportar informes_finales_duplicados con los filtros, columnas y formato pedidos
+    return descargar_tabla("informes_finales_duplicados", "Informes Finales Duplicados")
+
+# -----------------------VALIDACION Y CONVERSION DE TIPOS POR BLOQUES---------------------------------------
+
+# Validar cada archivo antes de escribir en la base de datos
+VALIDAR_CARGAS = os.getenv("VALIDAR_CARGAS", "1") == "1"
+
+# Filas que se validan juntas en cada DataFrame
+TAMANO_BLOQUE_VALIDACION = int(os.getenv("TAMANO_BLOQUE_VALIDACION", "50000"))
+
+# Rango permitido para las columnas de tipo respuesta (PREGUNTA1..PREGUNTA40)
+PREGUNTA_MINIMO = int(os.getenv("PREGUNTA_MINIMO", "1"))
+PREGUNTA_MAXIMO = int(os.getenv("PREGUNTA_MAXIMO", "5"))
+
+# Tipo compacto (entero con nulos de pandas) de las respuestas de cada bloque
+TIPO_RESPUESTAS = "Int8" if -128 <= PREGUNTA_MINIMO and PREGUNTA_MAXIMO <= 127 else "Int32"
+
+# Número de filas de ejemplo que se informan por cada columna con errores
+EJEMPLOS_POR_ERROR = 10
+
+# Valores que se consideran celdas vacías
+VALORES_VACIOS = ("", " ", None)
+
+
+def agrupar_en_bloques(filas, tamano_bloque):
+    bloque = []
+    for row in filas:
+        bloque.append(row)
+        if len(bloque) >= tamano_bloque:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def registrar_errores(reporte, columna, motivo, mascara, numeros_fila):
+    cantidad = int(mascara.sum())
+    if not cantidad:
+        return
+    entrada = reporte["columnas"].setdefault(columna, {"motivo": motivo, "errores": 0, "filas": []})
+    entrada["errores"] += cantidad
+    faltan = EJEMPLOS_POR_ERROR - len(entrada["filas"])
+    if faltan > 0:
+        entrada["filas"].extend(int(fila) for fila in numeros_fila[mascara][:faltan])
+    reporte["errores"] += cantidad
+
+
+class ArchivoInvalido(ValueError):
+    # Errores de validación encontrados durante la carga
+    def __init__(self, reporte, mensaje=None):
+        super().__init__(mensaje or mensaje_validacion(reporte))
+        self.reporte = reporte
+
+
+def nuevo_reporte():
+    return {"valido": True, "filas": 0, "filas_vacias": 0, "errores": 0, "columnas": {}}
+
+
+def validar_bloque(bloque, esquema, primera_fila, reporte):
+    # Devuelve, por posición de columna, el valor convertido de cada fila o
+    # None donde la celda se deja como venía (vacía o no válida)
+    import numpy as np
+    import pandas as pd
+
+    lista_columnas = esquema.lista_columnas
+    total_columnas = len(lista_columnas)
+    numeros_fila = np.arange(primera_fila, primera_fila + len(bloque))
+
+    # Número de columnas de cada fila frente al esperado por la tabla
+    longitudes = np.fromiter((len(row) for row in bloque), dtype=np.int32, count=len(bloque))
+    registrar_errores(
+        reporte,
+        "_NUMERO_DE_COLUMNAS",
+        f"se esperaban {total_columnas} columnas",
+        longitudes != total_columnas,
+        numeros_fila,
+    )
+
+    # Ajustar las filas al ancho esperado para construir el DataFrame
+    if not (longitudes == total_columnas).all():
+        bloque = [
+            tuple(row[:total_columnas]) + (None,) * (total_columnas - len(row)) for row in bloque
+        ]
+    df = pd.DataFrame.from_records(bloque, columns=lista_columnas)
+
+    def vacios(columna):
+        return (df[columna].isna() | df[columna].isin(VALORES_VACIOS)).to_numpy()
+
+    convertidas = {}
+
+    # Las filas completamente vacías (final de la hoja) no se validan
+    filas_vacias = np.fromiter(
+        (all(value in VALORES_VACIOS for value in row) for row in bloque),
+        dtype=bool,
+        count=len(bloque),
+    )
+    reporte["filas_vacias"] += int(filas_vacias.sum())
+    con_datos = ~filas_vacias
+
+    registrar_errores(
+        reporte,
+        esquema.columna_clave,
+        "valor obligatorio",
+        vacios(esquema.columna_clave) & con_datos,
+        numeros_fila,
+    )
+
+    for columna in esquema.columnas_de_tipo("fecha"):
+        # Primero el formato ISO (vectorizado); solo lo que falle se intenta
+        # interpretar con formatos libres, que es mucho más lento
+        fechas = pd.to_datetime(df[columna], errors="coerce", format="ISO8601")
+        pendientes = fechas.isna().to_numpy() & ~vacios(columna)
+        if pendientes.any():
+            fechas[pendientes] = pd.to_datetime(
+                df[columna][pendientes], errors="coerce", format="mixed", dayfirst=True
+            )
+        registrar_errores(
+            reporte,
+            columna,
+            "fecha no válida",
+            fechas.isna().to_numpy() & ~vacios(columna) & con_datos,
+            numeros_fila,
+        )
+
+        # Se escribe la misma fecha que aceptó la validación (dd/mm/aa, con hora, etc.)
+        validas = (~fechas.isna()).to_numpy().tolist()
+        convertidas[esquema.lista_columnas.index(columna)] = [
+            fecha if valida else None
+            for fecha, valida in zip(pd.DatetimeIndex(fechas).to_pydatetime().tolist(), validas)
+        ]
+
+    for columna in esquema.columnas_de_tipo("respuesta"):
+
+        # Las respuestas tienen pocos valores distintos: se convierten los valores
+        # únicos y el resultado se reparte con los códigos de factorize
+        codigos, unicos = pd.factorize(df[columna], use_na_sentinel=True)
+        unicos = pd.Series(unicos, dtype=object)
+        numeros_unicos = pd.to_numeric(unicos, errors="coerce").to_numpy(dtype=float)
+        vacios_unicos = unicos.isin(VALORES_VACIOS).to_numpy()
+
+        presentes = codigos >= 0
+        numeros = np.full(len(codigos), np.nan)
+        numeros[presentes] = numeros_unicos[codigos[presentes]]
+        vacias = ~presentes
+        vacias[presentes] = vacios_unicos[codigos[presentes]]
+
+        no_numericos = np.isnan(numeros) & ~vacias
+        with np.errstate(invalid="ignore"):
+            fuera_de_rango = ~np.isnan(numeros) & (
+                (numeros < PREGUNTA_MINIMO) | (numeros > PREGUNTA_MAXIMO) | (numeros % 1 != 0)
+            )
+        registrar_errores(
+            reporte,
+            columna,
+            f"se esperaba un entero entre {PREGUNTA_MINIMO} y {PREGUNTA_MAXIMO}",
+            (no_numericos | fuera_de_rango) & con_datos,
+            numeros_fila,
+        )
+
+        # Las respuestas válidas se guardan como Int8 y se escriben como enteros
+        # de Python; las no válidas quedan nulas
+        validas = ~(np.isnan(numeros) | fuera_de_rango)
+        respuestas = pd.Series(numeros).where(validas).astype(TIPO_RESPUESTAS)
+        convertidas[esquema.lista_columnas.index(columna)] = respuestas.to_numpy(
+            dtype=object, na_value=None
+        ).tolist()
+
+    return convertidas
+
+
+def convertir_bloques(filas, esquema, reporte, abortar=None, generar_filas=True):
+    # Valida y convierte el archivo por bloques en la misma pasada en que se
+    # carga. Con errores y la validación activa se dejan de entregar filas, se
+    # sigue leyendo solo para completar el reporte y al final se lanza
+    # ArchivoInvalido para que la carga descarte la tabla sombra
+    abortar = VALIDAR_CARGAS if abortar is None else abortar
+    tipos_vectorizados = ("fecha", "respuesta")
+    otros_conversores = [
+        (posicion, conversor)
+        for posicion, conversor in esquema.conversores
+        if esquema.columnas[posicion][1] not in tipos_vectorizados
+    ]
+
+    # La fila 1 es el encabezado: los datos empiezan en la fila 2
+    primera_fila = 2
+    for bloque in agrupar_en_bloques(filas, TAMANO_BLOQUE_VALIDACION):
+        convertidas = list(validar_bloque(bloque, esquema, primera_fila, reporte).items())
+        primera_fila += len(bloque)
+        reporte["filas"] += len(bloque)
+        if not generar_filas or (abortar and reporte["errores"]):
+            continue
+
+        # Celdas vacías como en normalizar_filas; las columnas vectorizadas toman
+        # el valor convertido y las no válidas conservan el original
+        for numero, row in enumerate(bloque):
+            row = [value if value is not None else " " for value in row]
+            for posicion, conversor in otros_conversores:
+                if posicion < len(row) and row[posicion] != " ":
+                    row[posicion] = conversor(row[posicion])
+            for posicion, valores in convertidas:
+                valor = valores[numero]
+                if valor is not None and posicion < len(row):
+                    row[posicion] = valor
+            yield row
+
+    reporte["valido"] = reporte["errores"] == 0
+    if abortar and not reporte["valido"]:
+        raise ArchivoInvalido(reporte)
+
+
+def validar_archivo(ruta, esquema, progreso=None):
+    # Validación sin escritura (modo "validar" y antes de una carga incremental)
+    reporte = nuevo_reporte()
+    inicio = time.perf_counter()
+
+    filas = leer_filas_archivo(ruta)
+    if progreso:
+        filas = progreso.contar(progreso.medir_filas("lectura", filas))
+
+    with medir(progreso, "validacion"):
+        for _ in convertir_bloques(filas, esquema, reporte, abortar=False, generar_filas=False):
+            pass
+
+    reporte["segundos"] = round(time.perf_counter() - inicio, 2)
+    return reporte
+
+
+def mensaje_validacion(reporte):
+    if reporte["valido"]:
+        return f"Validación exitosa: {reporte['filas']} filas sin errores."
+    detalle = ", ".join(
+        f"{columna} ({entrada['errores']})" for columna, entrada in reporte["columnas"].items()
+    )
+    return f"El archivo tiene {reporte['errores']} errores en {reporte['filas']} filas: {detalle}"
+
+
+# -----------------------AGREGACION DE INFORMES FINALES---------------------------------------
+
+# Calcular informes_finales dentro de la aplicación después de cada carga
+AGREGAR_INFORMES = os.getenv("AGREGAR_INFORMES", "0") == "1"
+
+TABLA_INFORMES = "informes_finales"
+
+# Columna que identifica al docente evaluado en todas las encuestas
+COLUMNA_DOCENTE = "DOCUMENTO_DOCENTE"
+
+# Cada fila del informe corresponde a un docente dentro de un programa
+LLAVES_INFORME = ["FACULTAD", "PROGRAMA", COLUMNA_DOCENTE]
+DATOS_DOCENTE = ["NOMBRE_DOCENTE", "CARGO_DOCENTE"]
+
+# Peso de cada instrumento en el puntaje final; se reparte entre los
+# instrumentos con respuestas para cada docente
+PESOS_INSTRUMENTOS = json.loads(
+    os.getenv("PESOS_INSTRUMENTOS", '{"ESTUDIANTES": 0.4, "AUTOEVALUACION": 0.2, "DECANO": 0.4}')
+)
+
+# Filas leídas por bloque de cada tabla de evaluación
+TAMANO_BLOQUE_AGREGACION = int(os.getenv("TAMANO_BLOQUE_AGREGACION", "50000"))
+
+
+def columnas_informe():
+    columnas = LLAVES_INFORME + DATOS_DOCENTE
+    for instrumento in PESOS_INSTRUMENTOS:
+        columnas += [f"PROMEDIO_{instrumento}", f"ENCUESTAS_{instrumento}"]
+    return columnas + ["PUNTAJE_FINAL", "PROMEDIO_PROGRAMA", "PROMEDIO_FACULTAD", "FECHA_CALCULO"]
+
+
+def crear_tabla_informes(cur):
+    definiciones = []
+    for instrumento in PESOS_INSTRUMENTOS:
+        definiciones += [
+            f"PROMEDIO_{instrumento} DECIMAL(5, 2) NULL",
+            f"ENCUESTAS_{instrumento} INT NOT NULL DEFAULT 0",
+        ]
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_INFORMES} (
+            ID_INFORME INT AUTO_INCREMENT PRIMARY KEY,
+            FACULTAD VARCHAR(255) NOT NULL,
+            PROGRAMA VARCHAR(255) NOT NULL,
+            {COLUMNA_DOCENTE} VARCHAR(64) NOT NULL,
+            NOMBRE_DOCENTE VARCHAR(255) NULL,
+            CARGO_DOCENTE VARCHAR(255) NULL,
+            {", ".join(definiciones)},
+            PUNTAJE_FINAL DECIMAL(5, 2) NULL,
+            PROMEDIO_PROGRAMA DECIMAL(5, 2) NULL,
+            PROMEDIO_FACULTAD DECIMAL(5, 2) NULL,
+            FECHA_CALCULO DATETIME NOT NULL,
+            INDEX IDX_INFORME_DOCENTE ({COLUMNA_DOCENTE}),
+            INDEX IDX_INFORME_PROGRAMA (FACULTAD, PROGRAMA)
+        )
+        """
+    )
+
+
+def verificar_tabla_informes():
+    # Si informes_finales ya existe (la calcula otro proceso) CREATE TABLE IF NOT
+    # EXISTS no la modifica: la agregación solo puede activarse cuando la tabla
+    # tiene todas las columnas que escribe. Se usa una conexión directa que se
+    # cierra al terminar: una del pool quedaría abierta y la heredarían los
+    # procesos creados después con fork
+    connection = conectar_base_datos()
+    if connection is None:
+        registrar_evento("verificacion_informes_omitida", tabla=TABLA_INFORMES)
+        return
+
+    try:
+        cur = connection.cursor()
+        cur.execute(
+            """
+            SELECT COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            """,
+            (TABLA_INFORMES,),
+        )
+        existentes = {fila[0].upper() for fila in cur.fetchall()}
+        cur.close()
+    finally:
+        connection.close()
+
+    faltantes = [columna for columna in columnas_informe() if columna.upper() not in existentes]
+    if existentes and faltantes:
+        raise RuntimeError(
+            f"AGREGAR_INFORMES=1 pero la tabla {TABLA_INFORMES} existente no tiene las columnas "
+            f"{', '.join(faltantes)}. Desactive AGREGAR_INFORMES o ajuste la tabla."
+        )
+
+
+def leer_respuestas(connection, esquema, docentes=None):
+    import pandas as pd
+
+    columnas = LLAVES_INFORME + DATOS_DOCENTE + esquema.columnas_de_tipo("respuesta")
+    query = f"SELECT {', '.join(columnas)} FROM {esquema.tabla}"
+    parametros = None
+    if docentes is not None:
+        query += f" WHERE {COLUMNA_DOCENTE} IN ({', '.join(['%s'] * len(docentes))})"
+        parametros = list(docentes)
+
+    # Leer por bloques con un cursor sin búfer para acotar la memoria
+    cur = connection.cursor(pymysql.cursors.SSCursor)
+    try:
+        cur.execute(query, parametros)
+        while True:
+            filas = cur.fetchmany(TAMANO_BLOQUE_AGREGACION)
+            if not filas:
+                break
+            yield pd.DataFrame.from_records(filas, columns=columnas)
+    finally:
+        cur.close()
+
+
+def agregar_bloque(df, preguntas):
+    import pandas as pd
+
+    # Solo cuentan las respuestas numéricas dentro del rango permitido
+    respuestas = df[preguntas].apply(pd.to_numeric, errors="coerce")
+    respuestas = respuestas.where(
+        (respuestas >= PREGUNTA_MINIMO) & (respuestas <= PREGUNTA_MAXIMO)
+    )
+
+    parcial = df[DATOS_DOCENTE].copy()
+    for columna in LLAVES_INFORME:
+        parcial[columna] = df[columna].astype(str).str.strip()
+    parcial["SUMA"] = respuestas.sum(axis=1)
+    parcial["CANTIDAD"] = respuestas.count(axis=1)
+    parcial["ENCUESTAS"] = (parcial["CANTIDAD"] > 0).astype("int64")
+
+    # Sumas parciales por docente y programa: se combinan entre bloques y tablas
+    return parcial.groupby(LLAVES_INFORME, sort=False).agg(
+        SUMA=("SUMA", "sum"),
+        CANTIDAD=("CANTIDAD", "sum"),
+        ENCUESTAS=("ENCUESTAS", "sum"),
+        NOMBRE_DOCENTE=("NOMBRE_DOCENTE", "last"),
+        CARGO_DOCENTE=("CARGO_DOCENTE", "last"),
+    )
+
+
+def agregar_instrumento(connection, instrumento, docentes=None):
+    import pandas as pd
+
+    parciales = [
+        agregar_bloque(bloque, esquema.columnas_de_tipo("respuesta"))
+        for esquema in ESQUEMAS_ENCUESTAS.values()
+        if esquema.instrumento == instrumento
+        for bloque in leer_respuestas(connection, esquema, docentes)
+    ]
+    if not parciales:
+        return None
+
+    total = pd.concat(parciales).groupby(level=LLAVES_INFORME, sort=False).agg(
+        {
+            "SUMA": "sum",
+            "CANTIDAD": "sum",
+            "ENCUESTAS": "sum",
+            "NOMBRE_DOCENTE": "last",
+            "CARGO_DOCENTE": "last",
+        }
+    )
+    total[f"PROMEDIO_{instrumento}"] = (total["SUMA"] / total["CANTIDAD"].where(total["CANTIDAD"] > 0)).round(2)
+    total[f"ENCUESTAS_{instrumento}"] = total["ENCUESTAS"]
+    return total.drop(columns=["SUMA", "CANTIDAD", "ENCUESTAS"])
+
+
+def promedios_por_grupo(informe):
+    # Promedio del puntaje final de los docentes de cada programa y facultad
+    informe["PROMEDIO_PROGRAMA"] = (
+        informe.groupby(["FACULTAD", "PROGRAMA"])["PUNTAJE_FINAL"].transform("mean").round(2)
+    )
+    informe["PROMEDIO_FACULTAD"] = (
+        informe.groupby("FACULTAD")["PUNTAJE_FINAL"].transform("mean").round(2)
+    )
+    return informe
+
+
+def calcular_informes(connection, docentes=None):
+    import pandas as pd
+
+    # Combinar los instrumentos por docente y programa
+    informe = None
+    for instrumento in PESOS_INSTRUMENTOS:
+        parcial = agregar_instrumento(connection, instrumento, docentes)
+        if parcial is None:
+            continue
+        if informe is None:
+            informe = parcial
+        else:
+            datos = parcial[DATOS_DOCENTE]
+            informe = informe.join(parcial.drop(columns=DATOS_DOCENTE), how="outer")
+            informe[DATOS_DOCENTE] = informe[DATOS_DOCENTE].combine_first(datos)
+
+    if informe is None:
+        return pd.DataFrame(columns=columnas_informe())
+    informe = informe.reset_index()
+
+    # Puntaje final ponderado con los instrumentos que tiene cada docente
+    ponderado = pd.Series(0.0, index=informe.index)
+    pesos = pd.Series(0.0, index=informe.index)
+    for instrumento, peso in PESOS_INSTRUMENTOS.items():
+        promedio = f"PROMEDIO_{instrumento}"
+        encuestas = f"ENCUESTAS_{instrumento}"
+        if promedio not in informe:
+            informe[promedio] = float("nan")
+            informe[encuestas] = 0
+        informe[encuestas] = informe[encuestas].fillna(0).astype("int64")
+        ponderado += informe[promedio].fillna(0) * peso
+        pesos += informe[promedio].notna() * peso
+    informe["PUNTAJE_FINAL"] = (ponderado / pesos.where(pesos > 0)).round(2)
+
+    informe = promedios_por_grupo(informe)
+    informe["FECHA_CALCULO"] = datetime.datetime.now().replace(microsecond=0)
+    return informe[columnas_informe()]
+
+
+def filas_informe(informe):
+    # Convertir a tuplas de Python con None en lugar de NaN para el INSERT
+    valores = informe.astype(object).where(informe.notna(), None)
+    return valores.itertuples(index=False, name=None)
+
+
+def actualizar_promedios_grupo(cur, facultades):
+    import pandas as pd
+
+    # Recalcular los promedios de las facultades afectadas con lo ya publicado
+    marcadores = ", ".join(["%s"] * len(facultades))
+    cur.execute(
+        f"SELECT FACULTAD, PROGRAMA, PUNTAJE_FINAL FROM {TABLA_INFORMES} "
+        f"WHERE FACULTAD IN ({marcadores})",
+        list(facultades),
+    )
+    grupos = pd.DataFrame.from_records(
+        cur.fetchall(), columns=["FACULTAD", "PROGRAMA", "PUNTAJE_FINAL"]
+    )
+    grupos["PUNTAJE_FINAL"] = pd.to_numeric(grupos["PUNTAJE_FINAL"], errors="coerce")
+    grupos = promedios_por_grupo(grupos).drop_duplicates(["FACULTAD", "PROGRAMA"])
+
+    cur.executemany(
+        f"UPDATE {TABLA_INFORMES} SET PROMEDIO_PROGRAMA = %s, PROMEDIO_FACULTAD = %s "
+        "WHERE FACULTAD = %s AND PROGRAMA = %s",
+        list(filas_informe(grupos[["PROMEDIO_PROGRAMA", "PROMEDIO_FACULTAD", "FACULTAD", "PROGRAMA"]])),
+    )
+
+
+def actualizar_informes(connection, cur, docentes=None):
+    # La reconstrucción usa la misma tabla sombra que otra reconstrucción
+    # concurrente y la actualización parcial no debe perderse en un intercambio
+    with bloqueo_tabla(cur, TABLA_INFORMES):
+        inicio = time.perf_counter()
+        crear_tabla_informes(cur)
+        columnas = columnas_informe()
+
+        if docentes is None:
+            # Reconstrucción completa en la tabla sombra y publicación atómica
+            informe = calcular_informes(connection)
+            tabla_nueva, indices = preparar_tabla_sombra(cur, TABLA_INFORMES)
+            try:
+                total, _ = insertar_por_lotes(
+                    cur, tabla_nueva, consulta_insert(tabla_nueva, columnas), filas_informe(informe)
+                )
+                connection.commit()
+                crear_indices(cur, tabla_nueva, indices)
+            except Exception:
+                connection.rollback()
+                cur.execute(f"DROP TABLE IF EXISTS {tabla_nueva}")
+                raise
+            intercambiar_tablas(cur, TABLA_INFORMES)
+
+        else:
+            # Solo se recalculan los docentes que cambiaron en la última carga
+            docentes = sorted(docentes)
+            total = 0
+            if docentes:
+                informe = calcular_informes(connection, docentes)
+
+                # Las facultades afectadas son las anteriores y las nuevas de estos docentes
+                facultades = set(informe["FACULTAD"])
+                for i in range(0, len(docentes), TAMANO_LOTE_INSERT):
+                    lote = docentes[i : i + TAMANO_LOTE_INSERT]
+                    cur.execute(
+                        f"SELECT DISTINCT FACULTAD FROM {TABLA_INFORMES} "
+                        f"WHERE {COLUMNA_DOCENTE} IN ({', '.join(['%s'] * len(lote))})",
+                        lote,
+                    )
+                    facultades.update(facultad for (facultad,) in cur.fetchall())
+                    borrar_por_clave(cur, TABLA_INFORMES, COLUMNA_DOCENTE, lote)
+
+                total, _ = insertar_por_lotes(
+                    cur, TABLA_INFORMES, consulta_insert(TABLA_INFORMES, columnas), filas_informe(informe)
+                )
+                if facultades:
+                    actualizar_promedios_grupo(cur, facultades)
+            connection.commit()
+
+        # Invalidar las exportaciones en caché del informe
+        incrementar_version(connection, cur, TABLA_INFORMES)
+
+        segundos = time.perf_counter() - inicio
+        registrar_evento(
+            "informes_recalculados",
+            tabla=TABLA_INFORMES,
+            filas=total,
+            segundos=round(segundos, 2),
+            completo=docentes is None,
+        )
+        return {"filas": total, "segundos": round(segundos, 2), "completo": docentes is None}
+
+
+def mensaje_informes(resumen):
+    return f"Informes finales actualizados: {resumen['filas']} filas en {resumen['segundos']} s."
+
+
+def recalcular_informes():
+    connection = obtener_conexion()
+    if connection is None:
+        return jsonify({"error": "Error de conexión a la base de datos"}), 503
+
+    try:
+        cur = connection.cursor()
+        resumen = actualizar_informes(connection, cur)
+        cur.close()
+        return jsonify(resumen)
+
+    except pymysql.Error as e:
+        return jsonify({"error": f"No se pudieron recalcular los informes: {e}"}), 500
+
+    finally:
+        # Devolver la conexión al pool
+        connection.close()
+
+
+# Sin la agregación activada informes_finales la mantiene otro proceso
+if AGREGAR_INFORMES:
+    rutas.add_url_rule(
+        "/recalcular_informes", "recalcular_informes", recalcular_informes, methods=["POST"]
+    )
+
+
+# -----------------------API JSON PAGINADA DE INFORMES---------------------------------------
+
+# Filas por página por defecto y máximo que puede pedir un cliente
+TAMANO_PAGINA_API = int(os.getenv("TAMANO_PAGINA_API", "500"))
+TAMANO_PAGINA_API_MAX = int(os.getenv("TAMANO_PAGINA_API_MAX", "5000"))
+
+# Columnas por las que se puede filtrar. Solo tienen índice garantizado en el
+# informes_finales que crea crear_tabla_informes; en las demás tablas (la
+# calculada por otro proceso, informes_finales_duplicados) un filtro se acepta
+# solo si alguno de los filtros pedidos encabeza un índice real de la tabla,
+# para que una página filtrada no recorra la tabla completa
+FILTROS_API = ("FACULTAD", "PROGRAMA", COLUMNA_DOCENTE)
+
+# Parámetros de la API que no son filtros
+PARAMETROS_API = ("limite", "despues", "columnas")
+
+indices_en_memoria = {}
+
+
+def indices_tabla(tabla, version):
+    # Columnas de cada índice de la tabla ({"PRIMARY": [...], ...}); la
+    # paginación avanza sobre la llave primaria. Se releen solo si cambia la versión
+    guardados = indices_en_memoria.get(tabla)
+    if guardados and guardados[0] == version:
+        return guardados[1]
+
+    connection = obtener_conexion()
+    if connection is None:
+        return None
+
+    try:
+        cur = connection.cursor()
+        cur.execute(
+            """
+            SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            ORDER BY INDEX_NAME, SEQ_IN_INDEX
+            """,
+            (tabla,),
+        )
+        indices = {}
+        for nombre, columna in cur.fetchall():
+            indices.setdefault(nombre, []).append(columna)
+        cur.close()
+    finally:
+        connection.close()
+
+    indices_en_memoria[tabla] = (version, indices)
+    return indices
+
+
+def validar_filtros_indexados(indices, argumentos):
+    # Al menos un filtro debe ser la primera columna de un índice de la tabla
+    filtros = {nombre.upper() for nombre in argumentos.keys() if nombre not in PARAMETROS_API}
+    if not filtros:
+        return
+    iniciales = {columnas[0].upper() for columnas in indices.values()}
+    if not filtros & iniciales:
+        disponibles = [columna for columna in FILTROS_API if columna in iniciales]
+        raise ValueError(
+            "Los filtros pedidos no tienen índice en esta tabla; incluya al menos uno de: "
+            + (", ".join(disponibles) or "ninguno (la tabla no tiene índices para filtrar)")
+        )
+
+
+def codificar_cursor(valores):
+    # Cursor opaco con los valores de la llave de la última fila entregada
+    texto = json.dumps([valor_json(value) for value in valores], separators=(",", ":"))
+    return base64.urlsafe_b64encode(texto.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor, llave):
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError("Cursor inválido")
+    if not isinstance(valores, list) or len(valores) != len(llave):
+        raise ValueError("Cursor inválido")
+    return valores
+
+
+def valor_json(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return value
+
+
+def limite_pagina(argumentos):
+    try:
+        limite = int(argumentos.get("limite", TAMANO_PAGINA_API))
+    except ValueError:
+        raise ValueError("El límite debe ser un número entero")
+    if limite < 1:
+        raise ValueError("El límite debe ser mayor que cero")
+    return min(limite, TAMANO_PAGINA_API_MAX)
+
+
+def consulta_pagina(tabla, columnas_disponibles, indices, argumentos, limite):
+    pedidas, condiciones, parametros = filtros_consulta(
+        columnas_disponibles, argumentos, PARAMETROS_API, FILTROS_API
+    )
+    validar_filtros_indexados(indices, argumentos)
+    llave = indices.get("PRIMARY", [])
+
+    # La llave siempre se incluye en la proyección para poder construir el cursor
+    seleccion = list(columnas_disponibles)
+    if pedidas:
+        seleccion = pedidas + [columna for columna in llave if columna not in pedidas]
+
+    # Paginación por llave: la página siguiente empieza después de la última
+    # llave entregada, así el costo no crece con el número de página como OFFSET
+    columnas_llave = ", ".join(f"`{columna}`" for columna in llave)
+    if argumentos.get("despues"):
+        valores_llave = decodificar_cursor(argumentos["despues"], llave)
+        if len(llave) == 1:
+            condiciones.append(f"{columnas_llave} > %s")
+        else:
+            condiciones.append(f"({columnas_llave}) > ({', '.join(['%s'] * len(llave))})")
+        parametros.extend(valores_llave)
+
+    query = f"SELECT {', '.join(f'`{columna}`' for columna in seleccion)} FROM {tabla}"
+    if condiciones:
+        query += " WHERE " + " AND ".join(condiciones)
+
+    # Se pide una fila de más para saber si existe una página siguiente
+    query += f" ORDER BY {columnas_llave} LIMIT {limite + 1}"
+    return query, tuple(parametros), seleccion
+
+
+def fecha_modificacion(version):
+    # La versión es "CREATE_TIME|UPDATE_TIME|VERSION" en segundos Unix; UPDATE_TIME
+    # es nulo mientras la tabla no se modifica después de crearse o de reiniciar MySQL
+    creada, actualizada, _ = (version.split("|") + ["None", "None", ""])[:3]
+    for valor in (actualizada, creada):
+        try:
+            segundos = float(valor)
+        except ValueError:
+            continue
+        return datetime.datetime.fromtimestamp(int(segundos), tz=datetime.timezone.utc)
+    return None
+
+
+def no_modificado(etag, modificado):
+    # If-None-Match tiene prioridad sobre If-Modified-Since (RFC 9110)
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    return bool(modificado and request.if_modified_since and modificado <= request.if_modified_since)
+
+
+def consultar_pagina(tabla):
+    version = version_datos(tabla)
+    columnas_disponibles = columnas_tabla(tabla, version) if version is not None else None
+    indices = indices_tabla(tabla, version) if columnas_disponibles is not None else None
+    if indices is None:
+        return jsonify({"error": "Error de conexión a la base de datos"}), 503
+    if not columnas_disponibles:
+        return jsonify({"error": f"La tabla {tabla} no existe"}), 404
+    llave = indices.get("PRIMARY")
+    if not llave:
+        return jsonify({"error": f"La tabla {tabla} no tiene llave primaria para paginar"}), 500
+
+    try:
+        limite = limite_pagina(request.args)
+        query, parametros, seleccion = consulta_pagina(
+            tabla, columnas_disponibles, indices, request.args, limite
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # La página solo cambia si cambia la consulta o la versión de la tabla
+    etag = etag_exportacion(tabla, f"{query}|{parametros}", version, ".json")
+    modificado = fecha_modificacion(version)
+    encabezados = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if modificado:
+        encabezados["Last-Modified"] = http_date(modificado)
+
+    if no_modificado(etag, modificado):
+        metricas.incrementar("api_paginas_total", tabla=tabla, resultado="no_modificado")
+        return Response(status=304, headers=encabezados)
+
+    connection = obtener_conexion()
+    if connection is None:
+        return jsonify({"error": "Error de conexión a la base de datos"}), 503
+
+    try:
+        cur = connection.cursor()
+        cur.execute(query, parametros)
+        filas = cur.fetchall()
+        cur.close()
+    finally:
+        connection.close()
+
+    # Solo se devuelven las columnas pedidas; la llave agregada se usa para el cursor
+    pedidas = seleccion
+    if request.args.get("columnas"):
+        pedidas = seleccion[: len(separar_columnas(request.args["columnas"]))]
+    posiciones_llave = [seleccion.index(columna) for columna in llave]
+
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = codificar_cursor([filas[-1][posicion] for posicion in posiciones_llave])
+
+    datos = [
+        {columna: valor_json(value) for columna, value in zip(pedidas, fila)}
+        for fila in filas
+    ]
+    metricas.incrementar("api_paginas_total", tabla=tabla, resultado="pagina")
+
+    argumentos_siguiente = {**request.args.to_dict(flat=False), "despues": siguiente}
+    respuesta = jsonify(
+        {
+            "datos": datos,
+            "cantidad": len(datos),
+            "limite": limite,
+            "siguiente": siguiente,
+            "url_siguiente": url_for(request.endpoint, **argumentos_siguiente) if siguiente else None,
+        }
+    )
+    respuesta.headers.update(encabezados)
+    return respuesta
+
+
+@rutas.route("/api/informes")
+def api_informes():
+    # Páginas JSON de informes_finales filtrables por FACULTAD, PROGRAMA y DOCUMENTO_DOCENTE
+    return consultar_pagina("informes_finales")
+
+
+@rutas.route("/api/informes_duplicados")
+def api_informes_duplicados():
+    # Páginas JSON de informes_finales_duplicados con los mismos filtros
+    return consultar_pagina("informes_finales_duplicados")
+
+
+# -----------------------TRABAJOS DE CARGA EN SEGUNDO PLANO---------------------------------------
+
+# Ejecutar las cargas en segundo plano (0 para ejecutarlas dentro de la petición)
+CARGA_EN_SEGUNDO_PLANO = os.getenv("CARGA_EN_SEGUNDO_PLANO", "1") == "1"
+
+# Número de cargas que se procesan a la vez en cada proceso
+TRABAJOS_CONCURRENTES = int(os.getenv("TRABAJOS_CONCURRENTES", "2"))
+
+# Directorio con el estado de cada trabajo, compartido por todos los procesos
+DIRECTORIO_TRABAJOS = os.getenv("DIRECTORIO_TRABAJOS") or os.path.join(
+    tempfile.gettempdir(), "trabajos_carga"
+)
+
+# Horas que se conserva el estado de un trabajo terminado
+TRABAJOS_HORAS_RETENCION = int(os.getenv("TRABAJOS_HORAS_RETENCION", "24"))
+
+# Permite pedir un perfil cProfile de una carga con el campo "perfilar"
+PERFILADO_CARGAS = os.getenv("PERFILADO_CARGAS", "0") == "1"
+
+# Segundos entre latidos de los trabajos en curso y segundos sin latido tras
+# los que un trabajo se da por perdido (su proceso se reinició o terminó)
+LATIDO_SEGUNDOS = float(os.getenv("LATIDO_SEGUNDOS", "10"))
+LATIDO_VENCIDO_SEGUNDOS = float(os.getenv("LATIDO_VENCIDO_SEGUNDOS", "60"))
+
+FASES_FINALES = ("completado", "error")
+
+ejecutor_cargas = ThreadPoolExecutor(
+    max_workers=TRABAJOS_CONCURRENTES, thread_name_prefix="carga"
+)
+
+# Cargas que pueden tener a la vez una conexión del pool en cada proceso, sumando
+# las subidas sueltas y las de todos los lotes; se deja al menos una conexión
+# libre para las peticiones
+CARGAS_SIMULTANEAS = max(1, min(int(os.getenv("CARGAS_SIMULTANEAS", str(POOL_TAMANO - 1))), POOL_TAMANO - 1))
+cupos_carga = threading.BoundedSemaphore(CARGAS_SIMULTANEAS)
+
+
+class ProgresoTrabajo(CronometroEtapas):
+    def __init__(self, id_trabajo, tabla):
+        super().__init__()
+        self.id_trabajo = id_trabajo
+        self.tabla = tabla
+        self.fase = "en_cola"
+        self.filas = 0
+        self.total_estimado = None
+        self.mensaje = None
+        self.reporte = None
+        self.creado = time.time()
+        self.inicio_conteo = None
+        self.fin_conteo = None
+        self.filas_confirmadas = 0
+        self.reanudable = False
+        self.perfil = None
+        self.pid = os.getpid()
+        self._ultimo_guardado = 0.0
+        self._bloqueo_guardado = threading.Lock()
+        latidos.registrar(self)
+
+    def cambiar_fase(self, fase, mensaje=None):
+        self.fase = fase
+        if mensaje is not None:
+            self.mensaje = mensaje
+        self.guardar()
+        if fase in FASES_FINALES:
+            latidos.retirar(self)
+
+    def contar(self, filas):
+        # Contar las filas a medida que pasan por el flujo de carga
+        self.filas = 0
+        self.inicio_conteo = time.time()
+        self.fin_conteo = None
+        for row in filas:
+            self.filas += 1
+            if self.filas % 1000 == 0:
+                self.guardar(forzar=False)
+            yield row
+        self.fin_conteo = time.time()
+        self.guardar()
+
+    def a_dict(self):
+        # La velocidad se mide solo mientras las filas pasan por el flujo
+        filas_por_segundo = 0.0
+        if self.inicio_conteo is not None:
+            transcurrido = (self.fin_conteo or time.time()) - self.inicio_conteo
+            filas_por_segundo = self.filas / transcurrido if transcurrido > 0 else 0.0
+
+        eta = None
+        if self.total_estimado and filas_por_segundo > 0 and self.fase in (
+            "validando", "convirtiendo", "cargando"
+        ):
+            eta = max(self.total_estimado - self.filas, 0) / filas_por_segundo
+
+        return {
+            "trabajo": self.id_trabajo,
+            "tabla": self.tabla,
+            "fase": self.fase,
+            "filas": self.filas,
+            "total_estimado": self.total_estimado,
+            "filas_por_segundo": round(filas_por_segundo, 1),
+            "eta_segundos": round(eta, 1) if eta is not None else None,
+            "transcurrido_segundos": round(time.time() - self.creado, 1),
+            "mensaje": self.mensaje,
+            "reporte": self.reporte,
+            "filas_confirmadas": self.filas_confirmadas,
+            "reanudable": self.reanudable,
+            "etapas": {etapa: round(segundos, 3) for etapa, segundos in self.etapas.items()},
+            "perfil": self.perfil,
+            "pid": self.pid,
+            "latido": time.time(),
+        }
+
+    def guardar(self, forzar=True):
+        # Escribir el estado como máximo una vez por segundo durante la carga
+        ahora = time.monotonic()
+        if not forzar and ahora - self._ultimo_guardado < 1:
+            return
+        self._ultimo_guardado = ahora
+
+        # El hilo de latidos también guarda el estado: una escritura a la vez
+        with self._bloqueo_guardado:
+            escribir_estado_trabajo(self.id_trabajo, self.a_dict())
+
+
+def escribir_estado_trabajo(id_trabajo, estado):
+    os.makedirs(DIRECTORIO_TRABAJOS, exist_ok=True)
+    ruta = ruta_estado_trabajo(id_trabajo)
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as destino:
+        json.dump(estado, destino)
+    os.replace(temporal, ruta)
+
+
+class LatidosTrabajos:
+    # Vuelve a guardar periódicamente el estado de los trabajos en curso del
+    # proceso, también en fases largas sin avance (en cola, esperando el
+    # bloqueo, indexando). Un estado sin latido reciente indica que el proceso
+    # que lo ejecutaba ya no existe
+    def __init__(self):
+        self.bloqueo = threading.Lock()
+        self.trabajos = {}
+        self.hilo = None
+
+    def registrar(self, progreso):
+        with self.bloqueo:
+            self.trabajos[progreso.id_trabajo] = progreso
+            if self.hilo is None or not self.hilo.is_alive():
+                self.hilo = threading.Thread(target=self.latir, name="latidos", daemon=True)
+                self.hilo.start()
+
+    def retirar(self, progreso):
+        with self.bloqueo:
+            if self.trabajos.get(progreso.id_trabajo) is progreso:
+                del self.trabajos[progreso.id_trabajo]
+
+    def latir(self):
+        while True:
+            time.sleep(LATIDO_SEGUNDOS)
+            with self.bloqueo:
+                activos = list(self.trabajos.values())
+            for progreso in activos:
+                try:
+                    progreso.guardar()
+                except OSError:
+                    pass
+
+    def reiniciar(self):
+        # Un proceso creado con fork no hereda los trabajos ni el hilo
+        self.bloqueo = threading.Lock()
+        self.trabajos = {}
+        self.hilo = None
+
+
+latidos = LatidosTrabajos()
+os.register_at_fork(after_in_child=latidos.reiniciar)
+
+
+def solicita_perfil(formulario):
+    return PERFILADO_CARGAS and formulario.get("perfilar") in ("1", "on", "true")
+
+
+def ruta_estado_trabajo(id_trabajo):
+    return os.path.join(DIRECTORIO_TRABAJOS, f"{id_trabajo}.json")
+
+
+def ruta_perfil(id_trabajo):
+    return os.path.join(DIRECTORIO_TRABAJOS, f"{id_trabajo}.prof")
+
+
+def ruta_reanudacion(id_trabajo):
+    return os.path.join(DIRECTORIO_TRABAJOS, f"{id_trabajo}.reanudar")
+
+
+def guardar_reanudacion(progreso, esquema, ruta, modo, eliminar_faltantes):
+    # Lo necesario para repetir el trabajo con el mismo archivo y opciones
+    datos = {
+        "tabla": esquema.tabla,
+        "ruta": ruta,
+        "modo": modo,
+        "eliminar_faltantes": eliminar_faltantes,
+    }
+    with open(ruta_reanudacion(progreso.id_trabajo), "w", encoding="utf-8") as destino:
+        json.dump(datos, destino)
+
+
+def limpiar_trabajos_antiguos():
+    if not os.path.isdir(DIRECTORIO_TRABAJOS):
+        return
+    limite = time.time() - TRABAJOS_HORAS_RETENCION * 3600
+    for nombre in os.listdir(DIRECTORIO_TRABAJOS):
+        ruta = os.path.join(DIRECTORIO_TRABAJOS, nombre)
+        # Otro trabajador de gunicorn puede estar limpiando el mismo directorio:
+        # un archivo que desaparece a mitad de camino ya está limpio
+        with contextlib.suppress(FileNotFoundError):
+            if os.path.getmtime(ruta) < limite:
+                # Un trabajo reanudable vencido libera también el archivo conservado
+                if nombre.endswith(".reanudar"):
+                    with open(ruta, encoding="utf-8") as archivo:
+                        ruta_conservada = json.load(archivo)["ruta"]
+                    with contextlib.suppress(FileNotFoundError):
+                        eliminar_archivo_temporal(ruta_conservada)
+                eliminar_archivo_temporal(ruta)
+
+
+def estimar_filas(ruta):
+    # Estimación rápida del total de filas para calcular el tiempo restante
+    try:
+        if ruta.lower().endswith(".csv"):
+            with open(ruta, "rb") as archivo:
+                lineas = sum(bloque.count(b"\n") for bloque in iter(lambda: archivo.read(TAMANO_BLOQUE_COPIA), b""))
+            return max(lineas - 1, 0)
+
+        import openpyxl
+
+        wb = openpyxl.load_workbook(ruta, read_only=True)
+        try:
+            max_fila = wb.active.max_row
+        finally:
+            wb.close()
+        return max(max_fila - 1, 0) if max_fila else None
+    except Exception:
+        return None
+
+
+def ejecutar_trabajo_carga(progreso, esquema, ruta, modo, eliminar_faltantes, agregar=True):
+    connection = None
+    con_cupo = False
+    conservar_archivo = False
+    inicio = time.perf_counter()
+    tamano_archivo = os.path.getsize(ruta) if os.path.exists(ruta) else 0
+
+    # Perfil opcional del trabajo (solo el hilo de la carga) para analizarlo con pstats
+    perfilador = cProfile.Profile() if progreso.perfil else None
+    if perfilador:
+        perfilador.enable()
+
+    try:
+        progreso.cambiar_fase("analizando")
+        progreso.total_estimado = estimar_filas(ruta)
+
+        # El archivo completo se valida antes de cualquier escritura: así una
+        # carga con errores no deja efectos en la base (duplicados, hashes,
+        # puntos de control). La pasada de carga vuelve a convertir cada bloque
+        if modo == "validar" or VALIDAR_CARGAS:
+            progreso.cambiar_fase("validando")
+            progreso.reporte = validar_archivo(ruta, esquema, progreso)
+
+            if modo == "validar":
+                progreso.cambiar_fase("completado", mensaje_validacion(progreso.reporte))
+                return
+            if not progreso.reporte["valido"]:
+                progreso.cambiar_fase("error", mensaje_validacion(progreso.reporte))
+                return
+
+        # Esperar un cupo de carga antes de tomar una conexión del pool
+        if not cupos_carga.acquire(blocking=False):
+            progreso.cambiar_fase("en_espera")
+            cupos_carga.acquire()
+        con_cupo = True
+
+        # Conectar a la base de datos
+        connection = obtener_conexion()
+        if connection is None:
+            raise pymysql.OperationalError("Error de conexión a la base de datos")
+
+        cur = connection.cursor()
+        mensaje, docentes = ejecutar_carga(
+            connection, cur, esquema, ruta, modo, eliminar_faltantes, progreso
+        )
+
+        # Recalcular los informes finales de los docentes afectados (en un lote
+        # se recalculan una sola vez al final)
+        if AGREGAR_INFORMES and agregar:
+            progreso.cambiar_fase("agregando")
+            with progreso.etapa("agregacion"):
+                resumen_informes = actualizar_informes(connection, cur, docentes)
+            mensaje += " " + mensaje_informes(resumen_informes)
+        cur.close()
+
+        progreso.cambiar_fase("completado", mensaje)
+        return docentes
+
+    except ArchivoInvalido as e:
+        progreso.reporte = e.reporte
+        progreso.cambiar_fase("error", str(e))
+
+    except Exception as e:
+        # Con filas ya confirmadas se conserva el archivo para reanudar desde ahí
+        conservar_archivo = progreso.filas_confirmadas > 0
+        if conservar_archivo:
+            guardar_reanudacion(progreso, esquema, ruta, modo, eliminar_faltantes)
+        progreso.reanudable = conservar_archivo
+        progreso.cambiar_fase("error", f"Error durante la carga de datos: {str(e)}")
+
+    finally:
+        # Devolver la conexión al pool y el cupo de carga, y eliminar el archivo
+        # temporal de la subida
+        if connection:
+            connection.close()
+        if con_cupo:
+            cupos_carga.release()
+        if not conservar_archivo:
+            eliminar_archivo_temporal(ruta)
+
+        if perfilador:
+            perfilador.disable()
+            perfilador.dump_stats(ruta_perfil(progreso.id_trabajo))
+        registrar_metricas_carga(progreso, modo, tamano_archivo, time.perf_counter() - inicio)
+
+
+def registrar_metricas_carga(progreso, modo, tamano_archivo, segundos):
+    resultado = "ok" if progreso.fase == "completado" else "error"
+    metricas.observar(
+        "carga_duracion_segundos", segundos, tabla=progreso.tabla, modo=modo, resultado=resultado
+    )
+    for etapa, segundos_etapa in progreso.etapas.items():
+        metricas.observar("carga_etapa_segundos", segundos_etapa, tabla=progreso.tabla, etapa=etapa)
+    metricas.incrementar("carga_filas_total", progreso.filas, tabla=progreso.tabla)
+    metricas.incrementar("carga_bytes_total", tamano_archivo, tabla=progreso.tabla)
+
+    registrar_evento(
+        "carga",
+        trabajo=progreso.id_trabajo,
+        tabla=progreso.tabla,
+        modo=modo,
+        resultado=resultado,
+        filas=progreso.filas,
+        bytes=tamano_archivo,
+        segundos=round(segundos, 3),
+        etapas={etapa: round(valor, 3) for etapa, valor in progreso.etapas.items()},
+    )
+
+
+def encolar_carga(archivo, esquema):
+    limpiar_trabajos_antiguos()
+
+    # Volcar el archivo subido a disco: el trabajo lo lee después de responder
+    ruta = guardar_archivo_temporal(archivo)
+    return encolar_archivo(ruta, esquema, *opciones_carga(request.form))
+
+
+def encolar_archivo(ruta, esquema, modo, eliminar_faltantes, progreso=None):
+    if progreso is None:
+        progreso = ProgresoTrabajo(uuid.uuid4().hex, esquema.tabla)
+    if solicita_perfil(request.form):
+        progreso.perfil = url_for("perfil_carga", id_trabajo=progreso.id_trabajo)
+    progreso.guardar()
+
+    argumentos = (progreso, esquema, ruta, modo, eliminar_faltantes)
+    if CARGA_EN_SEGUNDO_PLANO:
+        ejecutor_cargas.submit(ejecutar_trabajo_carga, *argumentos)
+    else:
+        ejecutar_trabajo_carga(*argumentos)
+
+    # Los clientes que piden JSON reciben el identificador del trabajo
+    if request.accept_mimetypes.best == "application/json":
+        return (
+            jsonify(
+                {
+                    "trabajo": progreso.id_trabajo,
+                    "estado": url_for("estado_carga", id_trabajo=progreso.id_trabajo),
+                }
+            ),
+            202,
+        )
+
+    # La página de carga consulta el estado del trabajo hasta que termina
+    session["message"] = "La carga está en proceso."
+    return redirect(url_for(esquema.pagina_exito, trabajo=progreso.id_trabajo))
+
+
+@rutas.route("/estado_carga/<id_trabajo>")
+def estado_carga(id_trabajo):
+    ruta = ruta_estado_trabajo(id_trabajo)
+    if not re.fullmatch(r"[0-9a-f]{32}", id_trabajo) or not os.path.exists(ruta):
+        return jsonify({"error": "Trabajo no encontrado"}), 404
+
+    with open(ruta, encoding="utf-8") as archivo:
+        estado = json.load(archivo)
+
+    # Un trabajo sin latido reciente quedó huérfano (reinicio o despliegue del
+    # trabajador): se marca como fallido para que la página deje de consultarlo
+    latido = estado.get("latido") or 0
+    if estado["fase"] not in FASES_FINALES and time.time() - latido > LATIDO_VENCIDO_SEGUNDOS:
+        estado["fase"] = "error"
+        estado["mensaje"] = (
+            "La carga se interrumpió porque el proceso que la ejecutaba se detuvo "
+            "(reinicio o despliegue). Vuelva a cargar el archivo."
+        )
+        estado["reanudable"] = os.path.exists(ruta_reanudacion(id_trabajo))
+        escribir_estado_trabajo(id_trabajo, estado)
+    return jsonify(estado)
+
+
+@rutas.route("/perfil_carga/<id_trabajo>")
+def perfil_carga(id_trabajo):
+    ruta = ruta_perfil(id_trabajo)
+    if not re.fullmatch(r"[0-9a-f]{32}", id_trabajo) or not os.path.exists(ruta):
+        return jsonify({"error": "Perfil no encontrado"}), 404
+    return send_file(ruta, as_attachment=True, download_name=f"carga_{id_trabajo}.prof")
+
+
+@rutas.route("/reanudar_carga/<id_trabajo>", methods=["POST"])
+def reanudar_carga(id_trabajo):
+    ruta = ruta_reanudacion(id_trabajo)
+    if not re.fullmatch(r"[0-9a-f]{32}", id_trabajo) or not os.path.exists(ruta):
+        return jsonify({"error": "El trabajo no se puede reanudar"}), 404
+
+    with open(ruta, encoding="utf-8") as archivo:
+        datos = json.load(archivo)
+    os.remove(ruta)
+
+    # Se repite el mismo trabajo: su punto de control indica dónde continuar
+    progreso = ProgresoTrabajo(id_trabajo, datos["tabla"])
+    return encolar_archivo(
+        datos["ruta"],
+        ESQUEMAS_ENCUESTAS[datos["tabla"]],
+        datos["modo"],
+        datos["eliminar_faltantes"],
+        progreso,
+    )
+
+
+# -----------------------CARGA DE VARIOS ARCHIVOS EN PARALELO---------------------------------------
+
+# Procesos que leen al mismo tiempo los libros de Excel de un lote
+PROCESOS_LECTURA = int(os.getenv("PROCESOS_LECTURA", str(min(5, os.cpu_count() or 1))))
+
+# Los lectores no se crean con fork: el proceso ya tiene hilos (servidor, pool,
+# trabajos de carga) y un fork copiaría sus candados en cualquier estado
+CONTEXTO_LECTURA = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+# Extensiones aceptadas en un lote, sueltas o dentro de un zip
+EXTENSIONES_LOTE = (".xlsx", ".csv")
+
+
+def normalizar_encabezado(valor):
+    return re.sub(r"\s+", "_", str(valor or "").strip()).upper()
+
+
+def detectar_esquema(ruta):
+    encabezado = leer_encabezado(ruta)
+    if not encabezado:
+        return None
+
+    nombres = [normalizar_encabezado(valor) for valor in encabezado]
+    while nombres and not nombres[-1]:
+        nombres.pop()
+
+    # Primero por los nombres de las columnas; si el archivo trae otros
+    # títulos, por el número de columnas, que es distinto en cada encuesta
+    for esquema in ESQUEMAS_ENCUESTAS.values():
+        if nombres == esquema.lista_columnas:
+            return esquema
+    candidatos = [
+        esquema for esquema in ESQUEMAS_ENCUESTAS.values()
+        if len(esquema.lista_columnas) == len(nombres)
+    ]
+    return candidatos[0] if len(candidatos) == 1 else None
+
+
+def archivos_del_lote(archivos):
+    # Volcar a disco cada archivo suelto y cada archivo contenido en los zip
+    rutas = []
+    for archivo in archivos:
+        nombre = secure_filename(archivo.filename or "")
+        if not nombre.lower().endswith(".zip"):
+            rutas.append((nombre, guardar_archivo_temporal(archivo)))
+            continue
+
+        ruta_zip = guardar_archivo_temporal(archivo)
+        try:
+            with zipfile.ZipFile(ruta_zip) as comprimido:
+                for miembro in comprimido.infolist():
+                    nombre_miembro = os.path.basename(miembro.filename)
+                    sufijo = os.path.splitext(nombre_miembro)[1].lower()
+                    if (
+                        miembro.is_dir()
+                        or miembro.filename.startswith("__MACOSX")
+                        or nombre_miembro.startswith(".")
+                        or sufijo not in EXTENSIONES_LOTE
+                    ):
+                        continue
+
+                    fd, ruta = tempfile.mkstemp(suffix=sufijo, dir=DIRECTORIO_TEMPORAL)
+                    with os.fdopen(fd, "wb") as destino, comprimido.open(miembro) as origen:
+                        shutil.copyfileobj(origen, destino, TAMANO_BLOQUE_COPIA)
+                    rutas.append((nombre_miembro, ruta))
+        finally:
+            eliminar_archivo_temporal(ruta_zip)
+    return rutas
+
+
+def convertir_a_csv(ruta, tabla):
+    # Se ejecuta en otro proceso: la lectura del libro de Excel es la parte más
+    # costosa de la carga y aquí no compite por el GIL con las demás
+    esquema = ESQUEMAS_ENCUESTAS[tabla]
+    fd, ruta_csv = tempfile.mkstemp(suffix=".csv", dir=DIRECTORIO_TEMPORAL)
+    with os.fdopen(fd, "w", newline="", encoding="utf-8") as destino:
+        escritor = csv.writer(destino)
+        escritor.writerow(esquema.lista_columnas)
+        escritor.writerows(normalizar_filas(leer_filas_archivo(ruta), esquema.conversores))
+    return ruta_csv
+
+
+def ejecutar_lote(trabajos, modo, eliminar_faltantes):
+    cargas = []
+    lectores = ProcessPoolExecutor(
+        max_workers=max(1, min(PROCESOS_LECTURA, len(trabajos))), mp_context=CONTEXTO_LECTURA
+    )
+
+    # Cada carga usa su propia conexión del pool dentro de los cupos de carga
+    # del proceso, compartidos con las subidas sueltas y con otros lotes
+    cargas_simultaneas = max(1, min(CARGAS_SIMULTANEAS, len(trabajos)))
+    with ThreadPoolExecutor(max_workers=cargas_simultaneas, thread_name_prefix="lote") as cargadores:
+        try:
+            lecturas = {}
+            for progreso, esquema, ruta in trabajos:
+                argumentos = (progreso, esquema, ruta, modo, eliminar_faltantes, False)
+                if ruta.lower().endswith(".csv"):
+                    cargas.append((progreso, cargadores.submit(ejecutar_trabajo_carga, *argumentos)))
+                else:
+                    progreso.cambiar_fase("leyendo")
+                    lecturas[lectores.submit(convertir_a_csv, ruta, esquema.tabla)] = argumentos
+
+            # Cada archivo empieza a cargarse en cuanto termina su lectura
+            for futuro in as_completed(lecturas):
+                progreso, esquema, ruta, *opciones = lecturas[futuro]
+                eliminar_archivo_temporal(ruta)
+                try:
+                    ruta_csv = futuro.result()
+                except Exception as e:
+                    progreso.cambiar_fase("error", f"Error leyendo el archivo: {str(e)}")
+                    continue
+                cargas.append(
+                    (
+                        progreso,
+                        cargadores.submit(ejecutar_trabajo_carga, progreso, esquema, ruta_csv, *opciones),
+                    )
+                )
+        finally:
+            lectores.shutdown()
+
+    completadas = [(progreso, futuro.result()) for progreso, futuro in cargas]
+    completadas = [docentes for progreso, docentes in completadas if progreso.fase == "completado"]
+    if not AGREGAR_INFORMES or modo == "validar" or not completadas:
+        return
+
+    # Un solo recálculo de informes para todo el lote; una carga completa
+    # (sin lista de docentes) obliga a reconstruirlos todos
+    docentes = None
+    if all(afectados is not None for afectados in completadas):
+        docentes = set().union(*completadas)
+
+    # El recálculo también ocupa un cupo de carga mientras usa su conexión
+    with cupos_carga:
+        connection = obtener_conexion()
+        if connection is None:
+            registrar_evento("error_informes_lote", logging.ERROR, error="Error de conexión a la base de datos")
+            return
+        try:
+            cur = connection.cursor()
+            actualizar_informes(connection, cur, docentes)
+            cur.close()
+        except Exception as e:
+            registrar_evento("error_informes_lote", logging.ERROR, error=str(e))
+        finally:
+            # Devolver la conexión al pool
+            connection.close()
+
+
+@rutas.route("/cargar_lote", methods=["POST"])
+def cargar_lote():
+    limpiar_trabajos_antiguos()
+
+    archivos = request.files.getlist("archivos")
+    if not archivos:
+        return jsonify({"error": "No se recibieron archivos"}), 400
+    modo, eliminar_faltantes = opciones_carga(request.form)
+
+    # Identificar el tipo de encuesta de cada archivo por su encabezado
+    trabajos, errores, tablas = [], [], set()
+    for nombre, ruta in archivos_del_lote(archivos):
+        try:
+            esquema = detectar_esquema(ruta)
+        except Exception:
+            esquema = None
+
+        if esquema is None:
+            errores.append({"archivo": nombre, "error": "Tipo de encuesta no reconocido"})
+        elif esquema.tabla in tablas:
+            errores.append({"archivo": nombre, "error": f"Hay más de un archivo para {esquema.tabla}"})
+        else:
+            tablas.add(esquema.tabla)
+            trabajos.append((nombre, esquema, ruta))
+            continue
+        eliminar_archivo_temporal(ruta)
+
+    if errores or not trabajos:
+        for _, _, ruta in trabajos:
+            eliminar_archivo_temporal(ruta)
+        return jsonify({"errores": errores or [{"error": "El lote no contiene archivos"}]}), 400
+
+    respuesta, argumentos = [], []
+    for nombre, esquema, ruta in trabajos:
+        progreso = ProgresoTrabajo(uuid.uuid4().hex, esquema.tabla)
+        if solicita_perfil(request.form):
+            progreso.perfil = url_for("perfil_carga", id_trabajo=progreso.id_trabajo)
+        progreso.guardar()
+        argumentos.append((progreso, esquema, ruta))
+        respuesta.append(
+            {
+                "archivo": nombre,
+                "tabla": esquema.tabla,
+                "trabajo": progreso.id_trabajo,
+                "estado": url_for("estado_carga", id_trabajo=progreso.id_trabajo),
+            }
+        )
+
+    if CARGA_EN_SEGUNDO_PLANO:
+        threading.Thread(
+            target=ejecutar_lote, args=(argumentos, modo, eliminar_faltantes), name="lote", daemon=True
+        ).start()
+    else:
+        ejecutar_lote(argumentos, modo, eliminar_faltantes)
+
+    return jsonify({"trabajos": respuesta}), 202
+
+
+# -----------------------SUBIDAS POR BLOQUES REANUDABLES---------------------------------------
+
+# Directorio donde se guardan los bloques de cada subida hasta completarla
+DIRECTORIO_SUBIDAS = os.getenv("DIRECTORIO_SUBIDAS") or os.path.join(
+    tempfile.gettempdir(), "subidas_carga"
+)
+
+# Tamaño de bloque sugerido a los clientes
+TAMANO_BLOQUE_SUBIDA = int(os.getenv("TAMANO_BLOQUE_SUBIDA", str(8 * 1024 * 1024)))
+
+PATRON_SUBIDA = re.compile(r"[0-9a-f]{32}")
+
+
+def directorio_subida(id_subida):
+    return os.path.join(DIRECTORIO_SUBIDAS, id_subida)
+
+
+def leer_subida(id_subida):
+    ruta = os.path.join(directorio_subida(id_subida), "subida.json")
+    if not PATRON_SUBIDA.fullmatch(id_subida) or not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def bloques_recibidos(id_subida):
+    return sorted(
+        int(nombre[: -len(".parte")])
+        for nombre in os.listdir(directorio_subida(id_subida))
+        if nombre.endswith(".parte")
+    )
+
+
+def estado_subida(id_subida, subida):
+    recibidos = bloques_recibidos(id_subida)
+    return {
+        "subida": id_subida,
+        "tamano_bloque": subida["tamano_bloque"],
+        "total_bloques": subida["total_bloques"],
+        "recibidos": recibidos,
+        "faltantes": sorted(set(range(subida["total_bloques"])) - set(recibidos)),
+    }
+
+
+def limpiar_subidas_antiguas():
+    if not os.path.isdir(DIRECTORIO_SUBIDAS):
+        return
+    limite = time.time() - TRABAJOS_HORAS_RETENCION * 3600
+    for nombre in os.listdir(DIRECTORIO_SUBIDAS):
+        ruta = os.path.join(DIRECTORIO_SUBIDAS, nombre)
+        if os.path.getmtime(ruta) < limite:
+            shutil.rmtree(ruta, ignore_errors=True)
+
+
+@rutas.route("/subidas", methods=["POST"])
+def crear_subida():
+    limpiar_subidas_antiguas()
+
+    datos = request.get_json(silent=True) or {}
+    try:
+        tamano = int(datos["tamano"])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Se requiere el tamaño total del archivo"}), 400
+
+    tamano_bloque = TAMANO_BLOQUE_SUBIDA
+    subida = {
+        "nombre": secure_filename(datos.get("nombre") or "") or "archivo.xlsx",
+        "tamano": tamano,
+        "sha256": (datos.get("sha256") or "").lower() or None,
+        "tamano_bloque": tamano_bloque,
+        "total_bloques": max(1, math.ceil(tamano / tamano_bloque)),
+    }
+
+    id_subida = uuid.uuid4().hex
+    os.makedirs(directorio_subida(id_subida))
+    with open(os.path.join(directorio_subida(id_subida), "subida.json"), "w", encoding="utf-8") as destino:
+        json.dump(subida, destino)
+    return jsonify(estado_subida(id_subida, subida)), 201
+
+
+@rutas.route("/subidas/<id_subida>", methods=["GET"])
+def consultar_subida(id_subida):
+    # El cliente consulta los bloques faltantes para continuar una subida cortada
+    subida = leer_subida(id_subida)
+    if subida is None:
+        return jsonify({"error": "Subida no encontrada"}), 404
+    return jsonify(estado_subida(id_subida, subida))
+
+
+@rutas.route("/subidas/<id_subida>/<int:numero>", methods=["PUT"])
+def recibir_bloque(id_subida, numero):
+    subida = leer_subida(id_subida)
+    if subida is None:
+        return jsonify({"error": "Subida no encontrada"}), 404
+    if numero >= subida["total_bloques"]:
+        return jsonify({"error": f"Bloque fuera de rango: {numero}"}), 400
+
+    # Guardar el bloque en un temporal y verificar su checksum antes de aceptarlo
+    destino_final = os.path.join(directorio_subida(id_subida), f"{numero}.parte")
+    suma = hashlib.sha256()
+    with open(destino_final + ".tmp", "wb") as destino:
+        for bloque in iter(lambda: request.stream.read(TAMANO_BLOQUE_COPIA), b""):
+            suma.update(bloque)
+            destino.write(bloque)
+
+    esperado = (request.headers.get("X-Checksum-Sha256") or "").lower()
+    if esperado and esperado != suma.hexdigest():
+        eliminar_archivo_temporal(destino_final + ".tmp")
+        return jsonify({"error": f"Checksum incorrecto en el bloque {numero}"}), 422
+    os.replace(destino_final + ".tmp", destino_final)
+
+    return jsonify({"bloque": numero, "sha256": suma.hexdigest()})
+
+
+@rutas.route("/subidas/<id_subida>/completar", methods=["POST"])
+def completar_subida(id_subida):
+    subida = leer_subida(id_subida)
+    if subida is None:
+        return jsonify({"error": "Subida no encontrada"}), 404
+
+    estado = estado_subida(id_subida, subida)
+    if estado["faltantes"]:
+        return jsonify(dict(estado, error="Faltan bloques por subir")), 409
+
+    # Unir los bloques en orden y verificar el tamaño y el checksum del archivo
+    sufijo = os.path.splitext(subida["nombre"])[1].lower() or ".xlsx"
+    fd, ruta = tempfile.mkstemp(suffix=sufijo, dir=DIRECTORIO_TEMPORAL)
+    suma = hashlib.sha256()
+    with os.fdopen(fd, "wb") as destino:
+        for numero in range(subida["total_bloques"]):
+            with open(os.path.join(directorio_subida(id_subida), f"{numero}.parte"), "rb") as origen:
+                for bloque in iter(lambda: origen.read(TAMANO_BLOQUE_COPIA), b""):
+                    suma.update(bloque)
+                    destino.write(bloque)
+
+    error = None
+    if os.path.getsize(ruta) != subida["tamano"]:
+        error = "El tamaño del archivo unido no coincide con el declarado"
+    elif subida["sha256"] and subida["sha256"] != suma.hexdigest():
+        error = "El checksum del archivo unido no coincide con el declarado"
+    if error:
+        eliminar_archivo_temporal(ruta)
+        return jsonify({"error": error}), 422
+
+    # El tipo de encuesta se indica con "tabla" o se detecta por el encabezado
+    tabla = request.form.get("tabla")
+    esquema = ESQUEMAS_ENCUESTAS.get(tabla) if tabla else detectar_esquema(ruta)
+    if esquema is None:
+        eliminar_archivo_temporal(ruta)
+        return jsonify({"error": "Tipo de encuesta no reconocido"}), 400
+
+    shutil.rmtree(directorio_subida(id_subida), ignore_errors=True)
+    limpiar_trabajos_antiguos()
+    return encolar_archivo(ruta, esquema, *opciones_carga(request.form))
+
+
+# -----------------------------REGISTRO DE ESQUEMAS DE ENCUESTAS-----------------------------------------------
+
+# Base de las URL del dashboard PHP al que se regresa después de cada carga
+URL_DASHBOARDS = os.getenv(
+    "URL_DASHBOARDS", "https://apps1.colmayor.edu.co/evaluacion_docente/dashboard"
+)
+
+
+def convertir_texto(valor):
+    # Documentos e identificadores leídos como número no deben quedar con ".0"
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return valor
+
+
+def convertir_entero(valor):
+    # Respuestas leídas como 4.0 o "4" se guardan como entero; lo demás se deja
+    # igual para que la validación lo informe
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    if isinstance(valor, str) and valor.strip().isdigit():
+        return int(valor)
+    return valor
+
+
+def convertir_fecha(valor):
+    # Las fechas de Excel llegan como datetime; las de CSV como texto ISO o dd/mm/aaaa
+    if isinstance(valor, str):
+        texto = valor.strip()
+        try:
+            return datetime.datetime.fromisoformat(texto)
+        except ValueError:
+            pass
+        try:
+            return datetime.datetime.strptime(texto, "%d/%m/%Y")
+        except ValueError:
+            pass
+    return valor
+
+
+# Conversor de cada tipo de columna (las columnas de texto libre no se convierten)
+CONVERSORES_TIPO = {
+    "texto": None,
+    "identificador": convertir_texto,
+    "fecha": convertir_fecha,
+    "respuesta": convertir_entero,
+    "entero": convertir_entero,
+}
+
+
+@dataclass
+class EsquemaEncuesta:
+    tabla: str
+    columnas: tuple
+    endpoint_carga: str
+    pagina_exito: str
+    dashboard: str
+    archivo_dashboard: str
+    columna_clave: str = COLUMNA_CLAVE
+    instrumento: str = None
+    llave_duplicados: tuple = (COLUMNA_CLAVE,)
+    lista_columnas: list = field(init=False)
+    tipos: dict = field(init=False)
+
+    def __post_init__(self):
+        # Precompilar una sola vez las consultas y los conversores de la encuesta
+        self.lista_columnas = [nombre for nombre, _ in self.columnas]
+        self.tipos = dict(self.columnas)
+        self.posicion_clave = self.lista_columnas.index(self.columna_clave)
+        self.posicion_docente = self.lista_columnas.index(COLUMNA_DOCENTE)
+        self.query_insert = consulta_insert(self.tabla, self.lista_columnas)
+        self.tabla_sombra = f"{self.tabla}_nueva"
+        self.query_insert_sombra = consulta_insert(self.tabla_sombra, self.lista_columnas)
+        self.conversores = tuple(
+            (posicion, CONVERSORES_TIPO[tipo])
+            for posicion, (_, tipo) in enumerate(self.columnas)
+            if CONVERSORES_TIPO[tipo] is not None
+        )
+
+    def columnas_de_tipo(self, tipo):
+        return [nombre for nombre, tipo_columna in self.columnas if tipo_columna == tipo]
+
+
+def preguntas(cantidad):
+    return tuple((f"PREGUNTA{numero}", "respuesta") for numero in range(1, cantidad + 1))
+
+
+# Columnas del INSERT sin la columna autoincremental, en el orden del archivo
+COLUMNAS_EVAL_ESTUDIANTES = (
+    ("ID_ENCUESTA_QUSUARIO", "identificador"),
+    ("ID_GRUPO_DOCENTE", "identificador"),
+    ("FACULTAD", "texto"),
+    ("PROGRAMA", "texto"),
+    ("GRUPO", "texto"),
+    ("DOCUMENTO_DOCENTE", "identificador"),
+    ("NOMBRE_DOCENTE", "texto"),
+    ("CARGO_DOCENTE", "texto"),
+    ("ENCUESTA", "texto"),
+    ("ID_OPERARIO_U", "identificador"),
+    ("FECHA_DILIGENCIAMIENTO", "fecha"),
+) + preguntas(40)
+
+COLUMNAS_AUTOEVALUACION = (
+    ("ID_ENCUESTA_QUSUARIO", "identificador"),
+    ("ID_DOCENTE", "identificador"),
+    ("FACULTAD", "texto"),
+    ("PROGRAMA", "texto"),
+    ("DOCUMENTO_DOCENTE", "identificador"),
+    ("NOMBRE_DOCENTE", "texto"),
+    ("CARGO_DOCENTE", "texto"),
+    ("ENCUESTA", "texto"),
+    ("FECHA_DILIGENCIAMIENTO", "fecha"),
+)
+
+COLUMNAS_EVAL_DECANO = (
+    ("ID_ENCUESTA_QUSUARIO", "identificador"),
+    ("ID_DOCENTE", "identificador"),
+    ("FACULTAD", "texto"),
+    ("PROGRAMA", "texto"),
+    ("DOCUMENTO_EVALUADOR", "identificador"),
+    ("NOMBRE_EVALUADOR", "texto"),
+    ("DOCUMENTO_DOCENTE", "identificador"),
+    ("NOMBRE_DOCENTE", "texto"),
+    ("CARGO_DOCENTE", "texto"),
+    ("ENCUESTA", "texto"),
+    ("FECHA_DILIGENCIAMIENTO", "fecha"),
+)
+
+# Para agregar un nuevo instrumento basta con una entrada en esta lista
+ESQUEMAS_ENCUESTAS = {
+    esquema.tabla: esquema
+    for esquema in (
+        EsquemaEncuesta(
+            tabla="e_estud",
+            columnas=COLUMNAS_EVAL_ESTUDIANTES,
+            endpoint_carga="cargar_datos_eval_estudiantes",
+            pagina_exito="carga_exitosa_estud",
+            dashboard="e_estud_py_dashboard",
+            archivo_dashboard="e_estud_py.php",
+            instrumento="ESTUDIANTES",
+            llave_duplicados=("DOCUMENTO_DOCENTE", "GRUPO", "ID_ENCUESTA_QUSUARIO"),
+        ),
+        EsquemaEncuesta(
+            tabla="ae_docente_catedra",
+            columnas=COLUMNAS_AUTOEVALUACION + preguntas(31),
+            endpoint_carga="cargar_datos_ae_doc_catedra",
+            pagina_exito="carga_exitosa_ae_doc_cat",
+            dashboard="ae_catedra_py_dashboard",
+            archivo_dashboard="ae_doc_cat_py.php",
+            instrumento="AUTOEVALUACION",
+        ),
+        EsquemaEncuesta(
+            tabla="ae_docente_sin_catedra",
+            columnas=COLUMNAS_AUTOEVALUACION + preguntas(8),
+            endpoint_carga="cargar_datos_ae_doc_sin_catedra",
+            pagina_exito="carga_exitosa_ae_doc_sin_cat",
+            dashboard="ae_sin_catedra_py_dashboard",
+            archivo_dashboard="ae_doc_sin_cat_py.php",
+            instrumento="AUTOEVALUACION",
+        ),
+        EsquemaEncuesta(
+            tabla="e_decano_planta",
+            columnas=COLUMNAS_EVAL_DECANO + preguntas(19),
+            endpoint_carga="cargar_datos_e_dec_planta",
+            pagina_exito="carga_exitosa_e_dec_planta",
+            dashboard="e_dec_planta_py_dashboard",
+            archivo_dashboard="e_dec_planta_py.php",
+            instrumento="DECANO",
+            llave_duplicados=("DOCUMENTO_EVALUADOR", "DOCUMENTO_DOCENTE"),
+        ),
+        EsquemaEncuesta(
+            tabla="e_decano_catedra",
+            columnas=COLUMNAS_EVAL_DECANO + preguntas(8),
+            endpoint_carga="cargar_datos_e_dec_catedra",
+            pagina_exito="carga_exitosa_e_dec_catedra",
+            dashboard="e_dec_catedra_py_dashboard",
+            archivo_dashboard="e_dec_catedra_py.php",
+            instrumento="DECANO",
+            llave_duplicados=("DOCUMENTO_EVALUADOR", "DOCUMENTO_DOCENTE"),
+        ),
+    )
+}
+
+# Tablas que reciben cargas y que admiten restaurar la versión anterior
+TABLAS_CARGA = tuple(ESQUEMAS_ENCUESTAS)
+
+
+# -----------------------------FUNCIONES CARGA DE ARCHIVOS PLANOS EVALUACIONES-----------------------------------------------
+def registrar_rutas_encuesta(esquema):
+    def cargar_datos():
+        if request.method == "POST":
+            # Obtener el archivo Excel desde el formulario
+            archivo_excel = request.files["archivo_excel"]
+
+            try:
+                # Encolar la carga en segundo plano y mostrar su progreso
+                return encolar_carga(archivo_excel, esquema)
+
+            except Exception as e:
+                # Mensaje de error almacenado en la sesión
+                session["message"] = f"Error durante la carga de datos: {str(e)}"
+
+        # Redirigir en caso de no ser un método POST o en caso de error
+        return redirect(url_for(esquema.dashboard))
+
+    def carga_exitosa():
+        # Obtener el mensaje de la sesión
+        message = session.pop("message", None)
+        trabajo = request.args.get("trabajo")
+        return render_template(
+            "carga_exitosa.html",
+            message=message,
+            trabajo=trabajo,
+            dashboard=esquema.dashboard,
+        )
+
+    def ir_al_dashboard():
+        return redirect(f"{URL_DASHBOARDS}/{esquema.archivo_dashboard}")
+
+    # Conservar las mismas URL y nombres de endpoint que usan las plantillas y el PHP
+    rutas.add_url_rule(
+        f"/{esquema.endpoint_carga}", esquema.endpoint_carga, cargar_datos, methods=["GET", "POST"]
+    )
+    rutas.add_url_rule(f"/{esquema.pagina_exito}", esquema.pagina_exito, carga_exitosa)
+    rutas.add_url_rule(f"/{esquema.dashboard}", esquema.dashboard, ir_al_dashboard)
+
+
+for esquema_encuesta in ESQUEMAS_ENCUESTAS.values():
+    registrar_rutas_encuesta(esquema_encuesta)
+
+
+# -----------------------FABRICA DE LA APLICACION Y PRECALENTAMIENTO---------------------------------------
+
+# Conexiones que el precalentamiento deja abiertas en el pool de cada proceso;
+# con varios trabajadores cada una se multiplica por su número frente a
+# max_connections, así que abrir el pool completo (POOL_TAMANO) es opcional
+POOL_PRECALENTAR = int(os.getenv("POOL_PRECALENTAR", "1"))
+
+
+def crear_app(configuracion=None):
+    # pandas, numpy, openpyxl y pyarrow se importan dentro de las funciones que
+    # los usan, así crear la aplicación no los carga en cada proceso
+    aplicacion = Flask(__name__)
+    aplicacion.secret_key = os.getenv("SECRET_KEY", "key")  # Necesario para usar sesiones
+    aplicacion.config.from_mapping(configuracion or {})
+    # Los procesos lectores de los lotes importan el módulo pero no atienden peticiones
+    if AGREGAR_INFORMES and multiprocessing.parent_process() is None:
+        verificar_tabla_informes()
+    rutas.registrar(aplicacion)
+    return aplicacion
+
+
+def rss_proceso():
+    # Memoria residente actual del proceso en bytes
+    try:
+        with open("/proc/self/statm") as archivo:
+            return int(archivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def precalentar(aplicacion):
+    # Abrir las conexiones del pool y compilar las plantillas antes de recibir
+    # peticiones; debe llamarse en cada proceso, nunca antes de un fork
+    inicio = time.perf_counter()
+
+    conexiones = []
+    try:
+        for _ in range(min(POOL_PRECALENTAR, POOL_TAMANO)):
+            connection = obtener_conexion()
+            if connection is None:
+                break
+            conexiones.append(connection)
+    finally:
+        abiertas = len(conexiones)
+        for connection in conexiones:
+            connection.close()
+
+    plantillas = aplicacion.jinja_env.list_templates()
+    for nombre in plantillas:
+        aplicacion.jinja_env.get_template(nombre)
 
-@app.route("/carga_exitosa_e_dec_catedra")
-def carga_exitosa_e_dec_catedra():
-    # Obtener el mensaje de la sesión
-    message = session.pop("message", None)
-    return render_template("carga_exitosa_e_dec_catedra.html", message=message)
+    resumen = {
+        "conexiones": abiertas,
+        "plantillas": len(plantillas),
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
+    registrar_evento("precalentamiento", pid=os.getpid(), **resumen)
+    return resumen
 
 
-@app.route("/e_dec_catedra_py_dashboard")
-def e_dec_catedra_py_dashboard():
-    #return redirect("http://localhost/evaluacion_docente/dashboard/e_dec_catedra_py.php")
-    return redirect("https://apps1.colmayor.edu.co/evaluacion_docente/dashboard/e_dec_catedra_py.php")
+app = crear_app()
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Servidor de desarrollo; en producción se usa gunicorn con gunicorn.conf.py
+    if os.getenv("PRECALENTAR", "0") == "1":
+        precalentar(app)
+    app.run(debug=os.getenv("ENV") != "PROD")
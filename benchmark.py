@@ -0,0 +1,643 @@
+import os
+import sys
+import json
+import time
+import random
+import zlib
+import zipfile
+import shutil
+import tempfile
+import argparse
+import datetime
+import platform
+import resource
+import statistics
+import subprocess
+import threading
+import openpyxl
+
+# La aplicación se importa después de configurar las variables de entorno
+# que lee al arrancar (ver preparar_aplicacion)
+app = None
+
+# -----------------------CONFIGURACION DEL BENCHMARK---------------------------------------
+
+DIRECTORIO_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+
+# Libros generados: se reutilizan entre ejecuciones porque los grandes tardan minutos
+DIRECTORIO_LIBROS = os.getenv("BENCHMARK_LIBROS") or os.path.join(
+    tempfile.gettempdir(), "benchmark_libros"
+)
+
+# Directorio donde se escriben los resultados JSON de cada ejecución
+DIRECTORIO_RESULTADOS = os.path.join(DIRECTORIO_SCRIPT, "resultados_benchmark")
+
+TAMANOS_PREDETERMINADOS = "1000,10000,100000"
+
+# Datos de referencia para que los libros se parezcan a los reales
+FACULTADES = {
+    "FACULTAD DE ADMINISTRACION": ["ADMINISTRACION FINANCIERA", "GESTION EMPRESARIAL", "CONTADURIA PUBLICA"],
+    "FACULTAD DE ARQUITECTURA E INGENIERIA": ["CONSTRUCCIONES CIVILES", "INGENIERIA AMBIENTAL", "ARQUITECTURA"],
+    "FACULTAD DE CIENCIAS DE LA SALUD": ["BACTERIOLOGIA", "GERONTOLOGIA", "TECNOLOGIA EN SALUD"],
+    "FACULTAD DE CIENCIAS SOCIALES": ["PLANEACION Y DESARROLLO SOCIAL", "TRABAJO SOCIAL"],
+    "FACULTAD DE INGENIERIA": ["INGENIERIA INFORMATICA", "TECNOLOGIA EN SISTEMAS", "INGENIERIA DE SOFTWARE"],
+}
+NOMBRES = ["ANA", "CARLOS", "DIANA", "JORGE", "LUISA", "MARIA", "PEDRO", "SANDRA", "JUAN", "PAOLA"]
+APELLIDOS = ["GOMEZ", "RESTREPO", "OSPINA", "ZAPATA", "MUNERA", "CARDONA", "LOPEZ", "VELEZ", "ARANGO"]
+CARGOS = ["DOCENTE DE PLANTA", "DOCENTE DE CATEDRA", "DOCENTE OCASIONAL"]
+
+# Distribución de respuestas: predominan las calificaciones altas
+RESPUESTAS = [1, 2, 3, 4, 5]
+PESOS_RESPUESTAS = [2, 4, 14, 38, 42]
+
+# Proporción de respuestas que quedan en blanco
+PROPORCION_VACIAS = 0.02
+
+
+# -----------------------GENERADOR DE LIBROS SINTETICOS---------------------------------------
+
+def semilla_tabla(tabla, semilla):
+    # Semilla estable por tabla (hash() de Python cambia entre procesos)
+    return semilla * 1000003 + zlib.crc32(tabla.encode("utf-8"))
+
+
+def catalogo_docentes(aleatorio, cantidad):
+    docentes = []
+    for numero in range(cantidad):
+        facultad = aleatorio.choice(list(FACULTADES))
+        docentes.append(
+            {
+                "ID_DOCENTE": 5000 + numero,
+                "DOCUMENTO_DOCENTE": aleatorio.randint(10_000_000, 1_099_999_999),
+                "NOMBRE_DOCENTE": f"{aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)} {aleatorio.choice(APELLIDOS)}",
+                "CARGO_DOCENTE": aleatorio.choice(CARGOS),
+                "FACULTAD": facultad,
+                "PROGRAMA": aleatorio.choice(FACULTADES[facultad]),
+            }
+        )
+    return docentes
+
+
+def filas_sinteticas(esquema, filas, semilla):
+    aleatorio = random.Random(semilla_tabla(esquema.tabla, semilla))
+
+    # Unas 200 respuestas por docente, como en un semestre real
+    docentes = catalogo_docentes(aleatorio, max(20, filas // 200))
+
+    # Cada evaluador califica una sola vez a cada docente, como en los formularios de decano
+    evaluadores = [
+        (aleatorio.randint(10_000_000, 99_999_999), f"DECANO {aleatorio.choice(APELLIDOS)}")
+        for _ in range(-(-filas // len(docentes)))
+    ]
+    inicio_periodo = datetime.datetime(2024, 2, 1)
+    preguntas = esquema.columnas_de_tipo("respuesta")
+
+    for numero in range(filas):
+        docente = docentes[numero % len(docentes)]
+        evaluador = evaluadores[numero // len(docentes)]
+        valores = {
+            "ID_ENCUESTA_QUSUARIO": 1_000_000 + numero,
+            "ID_GRUPO_DOCENTE": docente["ID_DOCENTE"] * 100 + aleatorio.randint(1, 6),
+            "GRUPO": f"G{aleatorio.randint(1, 40):02d}",
+            "ENCUESTA": f"EVALUACION {esquema.tabla.upper()} 2024-1",
+            "ID_OPERARIO_U": aleatorio.randint(1, 50),
+            "DOCUMENTO_EVALUADOR": evaluador[0],
+            "NOMBRE_EVALUADOR": evaluador[1],
+            "FECHA_DILIGENCIAMIENTO": inicio_periodo
+            + datetime.timedelta(minutes=aleatorio.randint(0, 60 * 24 * 120)),
+            **docente,
+        }
+        respuestas = aleatorio.choices(RESPUESTAS, PESOS_RESPUESTAS, k=len(preguntas))
+        for pregunta, respuesta in zip(preguntas, respuestas):
+            valores[pregunta] = None if aleatorio.random() < PROPORCION_VACIAS else respuesta
+        yield [valores.get(columna) for columna in esquema.lista_columnas]
+
+
+def generar_libro(esquema, filas, ruta, semilla=1, formato="xlsx"):
+    ruta_parcial = ruta + ".parcial"
+
+    if formato == "csv":
+        import csv
+
+        with open(ruta_parcial, "w", newline="", encoding="utf-8") as destino:
+            escritor = csv.writer(destino)
+            escritor.writerow(esquema.lista_columnas)
+            for row in filas_sinteticas(esquema, filas, semilla):
+                escritor.writerow(["" if value is None else value for value in row])
+    else:
+        # write_only escribe las filas directamente al archivo sin mantenerlas en memoria
+        wb = openpyxl.Workbook(write_only=True)
+        hoja = wb.create_sheet()
+        hoja.append(esquema.lista_columnas)
+        for row in filas_sinteticas(esquema, filas, semilla):
+            hoja.append(row)
+        wb.save(ruta_parcial)
+        agregar_dimension(ruta_parcial, filas + 1, len(esquema.lista_columnas))
+
+    os.replace(ruta_parcial, ruta)
+    return ruta
+
+
+def agregar_dimension(ruta, filas, columnas):
+    # write_only no escribe <dimension>; sin ella el modo read_only entrega las
+    # filas sin las celdas vacías del final, a diferencia de un libro de Excel
+    from openpyxl.utils import get_column_letter
+
+    dimension = f'<dimension ref="A1:{get_column_letter(columnas)}{filas}"/>'.encode()
+    ruta_temporal = ruta + ".dimension"
+    with zipfile.ZipFile(ruta) as origen, zipfile.ZipFile(ruta_temporal, "w", zipfile.ZIP_DEFLATED) as destino:
+        for entrada in origen.infolist():
+            if not entrada.filename.startswith("xl/worksheets/sheet"):
+                destino.writestr(entrada, origen.read(entrada.filename))
+                continue
+
+            # Copiar la hoja por partes insertando la dimensión antes de <sheetViews>
+            with origen.open(entrada) as lectura, destino.open(entrada.filename, "w") as escritura:
+                inicio = lectura.read(64 * 1024)
+                escritura.write(inicio.replace(b"<sheetViews>", dimension + b"<sheetViews>", 1))
+                shutil.copyfileobj(lectura, escritura, 1024 * 1024)
+    os.replace(ruta_temporal, ruta)
+
+
+def libro_en_cache(esquema, filas, semilla, formato):
+    os.makedirs(DIRECTORIO_LIBROS, exist_ok=True)
+    ruta = os.path.join(DIRECTORIO_LIBROS, f"{esquema.tabla}_{filas}_s{semilla}.{formato}")
+    if not os.path.exists(ruta):
+        inicio = time.perf_counter()
+        generar_libro(esquema, filas, ruta, semilla, formato)
+        print(f"Libro generado {os.path.basename(ruta)} en {time.perf_counter() - inicio:.1f} s")
+    return ruta
+
+
+# -----------------------BASE DE DATOS SIMULADA---------------------------------------
+
+# Sustituto en memoria de PyMySQL: acepta las sentencias de la aplicación,
+# descarta las filas insertadas y genera al vuelo las filas de los informes.
+# Mide el costo propio de la aplicación (lectura, conversión, formato) sin
+# el de un servidor MySQL.
+
+class CursorSimulado:
+    def __init__(self, base):
+        self.base = base
+        self.resultado = iter(())
+        self.description = None
+        self.max_stmt_length = 1024000
+
+    def execute(self, query, parametros=None):
+        texto = " ".join(query.split())
+        self.description = None
+        self.resultado = iter(())
+
+        if texto.startswith("SELECT @@max_allowed_packet"):
+            self.resultado = iter([(64 * 1024 * 1024,)])
+        elif texto.startswith(("SELECT GET_LOCK", "SELECT RELEASE_LOCK")):
+            self.resultado = iter([(1,)])
+        elif texto.startswith("SELECT @@local_infile"):
+            self.resultado = iter([(0,)])
+        elif "information_schema.COLUMNS" in texto:
+            self.resultado = iter([(columna,) for columna in self.base.columnas(parametros[0])])
+        elif "information_schema.TABLES" in texto:
+            self.resultado = iter([(1704067200, None, self.base.version)])
+        elif texto.startswith("SELECT") and " FROM informes_finales" in texto:
+            tabla = texto.split(" FROM ")[1].split()[0]
+            columnas = self.base.columnas(tabla)
+            self.description = [(columna,) + (None,) * 6 for columna in columnas]
+            self.resultado = self.base.filas_informe(tabla)
+        return 0
+
+    def executemany(self, query, filas):
+        if query.startswith("INSERT"):
+            self.base.filas_insertadas += len(filas)
+        return len(filas)
+
+    def fetchone(self):
+        return next(self.resultado, None)
+
+    def fetchall(self):
+        return list(self.resultado)
+
+    def fetchmany(self, tamano):
+        return [fila for _, fila in zip(range(tamano), self.resultado)]
+
+    def close(self):
+        pass
+
+
+class ConexionSimulada:
+    def __init__(self, base):
+        self.base = base
+
+    def cursor(self, clase=None):
+        return CursorSimulado(self.base)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
+
+
+class BaseSimulada:
+    def __init__(self):
+        self.filas_insertadas = 0
+        self.filas_por_informe = 0
+        self.version = 0
+
+    def columnas(self, tabla):
+        if tabla.startswith("informes_finales"):
+            return ["ID_INFORME"] + app.columnas_informe()
+        return app.ESQUEMAS_ENCUESTAS[tabla].lista_columnas
+
+    def filas_informe(self, tabla):
+        aleatorio = random.Random(1)
+        docentes = catalogo_docentes(aleatorio, max(20, self.filas_por_informe // 3))
+        fecha = datetime.datetime(2024, 6, 30)
+        instrumentos = len(app.PESOS_INSTRUMENTOS)
+        for numero in range(self.filas_por_informe):
+            docente = docentes[numero % len(docentes)]
+            promedios = []
+            for _ in range(instrumentos):
+                promedios += [round(aleatorio.uniform(3, 5), 2), aleatorio.randint(5, 400)]
+            yield (
+                numero + 1,
+                docente["FACULTAD"],
+                docente["PROGRAMA"],
+                str(docente["DOCUMENTO_DOCENTE"]),
+                docente["NOMBRE_DOCENTE"],
+                docente["CARGO_DOCENTE"],
+                *promedios,
+                round(aleatorio.uniform(3, 5), 2),
+                4.21,
+                4.18,
+                fecha,
+            )
+
+
+# -----------------------MEDICION---------------------------------------
+
+class MonitorMemoria:
+    # Muestrea el RSS del proceso para obtener el pico de cada escenario
+    def __init__(self, intervalo=0.02):
+        self.intervalo = intervalo
+        self.pico = 0
+        self.activo = False
+        self.tamano_pagina = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def rss_actual(self):
+        try:
+            with open("/proc/self/statm") as archivo:
+                return int(archivo.read().split()[1]) * self.tamano_pagina
+        except OSError:
+            # Sin /proc se usa el pico del proceso completo (en KB en Linux, bytes en macOS)
+            pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return pico if sys.platform == "darwin" else pico * 1024
+
+    def muestrear(self):
+        while self.activo:
+            self.pico = max(self.pico, self.rss_actual())
+            time.sleep(self.intervalo)
+
+    def __enter__(self):
+        self.pico = self.rss_actual()
+        self.activo = True
+        self.hilo = threading.Thread(target=self.muestrear, daemon=True)
+        self.hilo.start()
+        return self
+
+    def __exit__(self, *excepcion):
+        self.activo = False
+        self.hilo.join()
+        self.pico = max(self.pico, self.rss_actual())
+
+
+def percentil(valores, porcentaje):
+    # Percentil por rango más cercano: con pocas repeticiones no se interpola
+    ordenados = sorted(valores)
+    posicion = max(0, min(len(ordenados) - 1, round(porcentaje / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[posicion]
+
+
+def resumir(escenario, latencias, filas, bytes_por_repeticion, pico_rss, extra):
+    mediana = statistics.median(latencias)
+    return {
+        "escenario": escenario,
+        **extra,
+        "filas": filas,
+        "repeticiones": len(latencias),
+        "latencia_p50_s": round(percentil(latencias, 50), 4),
+        "latencia_p95_s": round(percentil(latencias, 95), 4),
+        "latencia_min_s": round(min(latencias), 4),
+        "latencia_max_s": round(max(latencias), 4),
+        "filas_por_segundo": round(filas / mediana, 1) if mediana > 0 else None,
+        "mb_por_segundo": round(bytes_por_repeticion / mediana / 1e6, 2) if mediana > 0 else None,
+        "rss_pico_mb": round(pico_rss / 1e6, 1),
+    }
+
+
+# -----------------------ESCENARIOS---------------------------------------
+
+def medir_carga(cliente, esquema, ruta, repeticiones):
+    latencias, etapas = [], []
+    with MonitorMemoria() as monitor:
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            with open(ruta, "rb") as archivo:
+                respuesta = cliente.post(
+                    f"/{esquema.endpoint_carga}",
+                    data={"archivo_excel": (archivo, os.path.basename(ruta)), "modo_carga": "completa"},
+                    headers={"Accept": "application/json"},
+                    content_type="multipart/form-data",
+                )
+            latencias.append(time.perf_counter() - inicio)
+
+            # Con CARGA_EN_SEGUNDO_PLANO desactivado el trabajo ya terminó
+            estado = cliente.get(respuesta.get_json()["estado"]).get_json()
+            if estado["fase"] != "completado":
+                raise RuntimeError(f"La carga de {esquema.tabla} terminó en {estado['fase']}: {estado['mensaje']}")
+            etapas.append(estado.get("etapas") or {})
+    return latencias, monitor.pico, etapas
+
+
+def medir_descarga(cliente, ruta_url, repeticiones):
+    latencias, tamanos = [], []
+    with MonitorMemoria() as monitor:
+        for _ in range(repeticiones):
+            # Vaciar la caché de exportaciones para medir siempre la generación completa
+            shutil.rmtree(app.DIRECTORIO_CACHE_INFORMES, ignore_errors=True)
+            os.makedirs(app.DIRECTORIO_CACHE_INFORMES, exist_ok=True)
+
+            inicio = time.perf_counter()
+            respuesta = cliente.get(ruta_url, buffered=False)
+            tamano = 0
+            for parte in respuesta.response:
+                tamano += len(parte)
+            respuesta.close()
+            latencias.append(time.perf_counter() - inicio)
+            tamanos.append(tamano)
+
+            if respuesta.status_code != 200:
+                raise RuntimeError(f"La descarga {ruta_url} respondió {respuesta.status_code}")
+    return latencias, monitor.pico, int(statistics.median(tamanos))
+
+
+def sembrar_informes(filas):
+    # Solo en modo MySQL: reemplaza informes_finales con filas sintéticas
+    base = BaseSimulada()
+    base.filas_por_informe = filas
+    connection = app.obtener_conexion()
+    try:
+        cur = connection.cursor()
+        app.crear_tabla_informes(cur)
+        tabla_nueva, indices = app.preparar_tabla_sombra(cur, app.TABLA_INFORMES)
+        columnas = app.columnas_informe()
+        app.insertar_por_lotes(
+            cur,
+            tabla_nueva,
+            app.consulta_insert(tabla_nueva, columnas),
+            (fila[1:] for fila in base.filas_informe(app.TABLA_INFORMES)),
+        )
+        connection.commit()
+        app.crear_indices(cur, tabla_nueva, indices)
+        app.intercambiar_tablas(cur, app.TABLA_INFORMES)
+        app.incrementar_version(connection, cur, app.TABLA_INFORMES)
+        cur.close()
+    finally:
+        connection.close()
+
+
+def preparar_aplicacion(simulado):
+    global app
+
+    # Ejecutar cada carga dentro de la petición para medirla de punta a punta
+    os.environ["CARGA_EN_SEGUNDO_PLANO"] = "0"
+    sys.path.insert(0, DIRECTORIO_SCRIPT)
+    import app as aplicacion
+
+    app = aplicacion
+    app.CARGA_EN_SEGUNDO_PLANO = False
+    app.DIRECTORIO_CACHE_INFORMES = tempfile.mkdtemp(prefix="benchmark_cache_")
+
+    base = None
+    if simulado:
+        base = BaseSimulada()
+        app.obtener_conexion = lambda: ConexionSimulada(base)
+    return base
+
+
+# Proceso hijo que mide el arranque en frío: importar el módulo, crear la
+# aplicación y atender la primera petición
+CODIGO_ARRANQUE = """
+import json, sys, time
+inicio = time.perf_counter()
+import app
+aplicacion = app.crear_app()
+importacion = time.perf_counter() - inicio
+inicio = time.perf_counter()
+aplicacion.test_client().get("/metrics")
+print(json.dumps({
+    "importacion": importacion,
+    "primera_peticion": time.perf_counter() - inicio,
+    "rss": app.rss_proceso(),
+    "modulos": sorted(m for m in ("pandas", "numpy", "openpyxl", "pyarrow") if m in sys.modules),
+}))
+"""
+
+
+def medir_arranque(repeticiones):
+    # Cada repetición es un proceso nuevo, como un trabajador recién creado
+    mediciones = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-c", CODIGO_ARRANQUE],
+            cwd=DIRECTORIO_SCRIPT, capture_output=True, text=True, check=True,
+            env={**os.environ, "NIVEL_LOG": "WARNING"},
+        ).stdout
+        mediciones.append(json.loads(salida.strip().splitlines()[-1]))
+
+    importaciones = [medicion["importacion"] for medicion in mediciones]
+    rss = [medicion["rss"] or 0 for medicion in mediciones]
+    return {
+        "escenario": "arranque",
+        "ruta": "import app; crear_app()",
+        "formato": None,
+        "filas": 0,
+        "repeticiones": repeticiones,
+        "latencia_p50_s": round(percentil(importaciones, 50), 4),
+        "latencia_p95_s": round(percentil(importaciones, 95), 4),
+        "latencia_min_s": round(min(importaciones), 4),
+        "latencia_max_s": round(max(importaciones), 4),
+        "primera_peticion_p50_s": round(percentil([medicion["primera_peticion"] for medicion in mediciones], 50), 4),
+        "rss_pico_mb": round(max(rss) / 1e6, 1),
+        "rss_trabajador_mb": round(statistics.median(rss) / 1e6, 1),
+        "modulos_pesados": mediciones[-1]["modulos"],
+    }
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=DIRECTORIO_SCRIPT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar(argumentos):
+    base = preparar_aplicacion(argumentos.simulado)
+    cliente = app.app.test_client()
+    tamanos = [int(valor) for valor in argumentos.filas.split(",")]
+    tablas = argumentos.tablas.split(",") if argumentos.tablas else list(app.ESQUEMAS_ENCUESTAS)
+    resultados = []
+
+    if not argumentos.sin_arranque:
+        resultado = medir_arranque(max(argumentos.repeticiones, 5))
+        resultados.append(resultado)
+        print(json.dumps(resultado, ensure_ascii=False))
+
+    for tabla in tablas:
+        esquema = app.ESQUEMAS_ENCUESTAS[tabla]
+        for filas in tamanos:
+            ruta = libro_en_cache(esquema, filas, argumentos.semilla, argumentos.formato_libro)
+            latencias, pico, etapas = medir_carga(cliente, esquema, ruta, argumentos.repeticiones)
+
+            # Tiempo medio de cada etapa reportado por el trabajo de carga
+            promedio_etapas = {
+                etapa: round(statistics.mean(medicion.get(etapa, 0.0) for medicion in etapas), 4)
+                for etapa in sorted({etapa for medicion in etapas for etapa in medicion})
+            }
+            resultado = resumir(
+                "carga", latencias, filas, os.path.getsize(ruta), pico,
+                {"tabla": tabla, "formato": argumentos.formato_libro, "etapas_s": promedio_etapas},
+            )
+            resultados.append(resultado)
+            print(json.dumps(resultado, ensure_ascii=False))
+
+    for filas in tamanos:
+        if argumentos.simulado:
+            base.filas_por_informe = filas
+        elif argumentos.sembrar_informes:
+            sembrar_informes(filas)
+        else:
+            filas = None
+
+        for ruta_base in ("/descargar_informe_final", "/descargar_informe_final_duplicados"):
+            for formato in argumentos.formatos.split(","):
+                latencias, pico, tamano = medir_descarga(
+                    cliente, f"{ruta_base}?formato={formato}", argumentos.repeticiones
+                )
+                resultado = resumir(
+                    "descarga", latencias, filas or 0, tamano, pico,
+                    {"ruta": ruta_base, "formato": formato, "bytes": tamano},
+                )
+                resultados.append(resultado)
+                print(json.dumps(resultado, ensure_ascii=False))
+
+        # Sin sembrar, la tabla real no depende del tamaño pedido
+        if filas is None:
+            break
+
+    return {
+        "commit": commit_actual(),
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "base_datos": "simulada" if argumentos.simulado else "mysql",
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "semilla": argumentos.semilla,
+        "configuracion": {
+            "CARGA_RAPIDA": app.CARGA_RAPIDA,
+            "VALIDAR_CARGAS": app.VALIDAR_CARGAS,
+            "DETECTAR_DUPLICADOS": app.DETECTAR_DUPLICADOS,
+            "TAMANO_LOTE_INSERT": app.TAMANO_LOTE_INSERT,
+            "FILAS_POR_CONFIRMACION": app.FILAS_POR_CONFIRMACION,
+        },
+        "resultados": resultados,
+    }
+
+
+# -----------------------COMPARACION ENTRE EJECUCIONES---------------------------------------
+
+def clave_resultado(resultado):
+    return (
+        resultado["escenario"],
+        resultado.get("tabla") or resultado.get("ruta"),
+        resultado.get("formato"),
+        resultado["filas"],
+    )
+
+
+def comparar(ruta_base, ruta_nueva):
+    with open(ruta_base, encoding="utf-8") as archivo:
+        base = json.load(archivo)
+    with open(ruta_nueva, encoding="utf-8") as archivo:
+        nueva = json.load(archivo)
+
+    anteriores = {clave_resultado(resultado): resultado for resultado in base["resultados"]}
+    print(f"{base.get('commit')} -> {nueva.get('commit')}")
+    print(f"{'escenario':<10} {'tabla/ruta':<38} {'formato':<8} {'filas':>8} {'p50 antes':>10} {'p50 ahora':>10} {'cambio':>8} {'RSS MB':>8}")
+    for resultado in nueva["resultados"]:
+        anterior = anteriores.get(clave_resultado(resultado))
+        if anterior is None:
+            continue
+        cambio = (resultado["latencia_p50_s"] / anterior["latencia_p50_s"] - 1) * 100 if anterior["latencia_p50_s"] else 0.0
+        escenario, objetivo, formato, filas = clave_resultado(resultado)
+        print(
+            f"{escenario:<10} {objetivo:<38} {formato or '':<8} {filas:>8} "
+            f"{anterior['latencia_p50_s']:>10.3f} {resultado['latencia_p50_s']:>10.3f} "
+            f"{cambio:>+7.1f}% {resultado['rss_pico_mb']:>8.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de cargas y descargas de evaluación docente")
+    parser.add_argument("--filas", default=TAMANOS_PREDETERMINADOS, help="Tamaños separados por coma (1000 a 1000000)")
+    parser.add_argument("--tablas", default="", help="Tablas a cargar separadas por coma (por defecto todas)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--formato-libro", default="xlsx", choices=("xlsx", "csv"))
+    parser.add_argument("--formatos", default="xlsx,csv", help="Formatos de descarga separados por coma")
+    parser.add_argument("--simulado", action="store_true", help="Usar la base de datos simulada en memoria")
+    parser.add_argument(
+        "--sembrar-informes", action="store_true",
+        help="En MySQL, reemplazar informes_finales con filas sintéticas de cada tamaño",
+    )
+    parser.add_argument("--salida", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"), help="Comparar dos archivos de resultados")
+    parser.add_argument("--sin-arranque", action="store_true", help="Omitir la medición de arranque en frío")
+    parser.add_argument("--solo-generar", action="store_true", help="Solo generar los libros sintéticos")
+    argumentos = parser.parse_args()
+
+    if argumentos.comparar:
+        comparar(*argumentos.comparar)
+        return
+
+    if argumentos.solo_generar:
+        preparar_aplicacion(simulado=True)
+        tablas = argumentos.tablas.split(",") if argumentos.tablas else list(app.ESQUEMAS_ENCUESTAS)
+        for tabla in tablas:
+            for filas in argumentos.filas.split(","):
+                libro_en_cache(app.ESQUEMAS_ENCUESTAS[tabla], int(filas), argumentos.semilla, argumentos.formato_libro)
+        return
+
+    resumen = ejecutar(argumentos)
+
+    # Un archivo por ejecución, nombrado por commit y fecha para comparar entre commits
+    salida = argumentos.salida or os.path.join(
+        DIRECTORIO_RESULTADOS,
+        f"{resumen['commit'] or 'sin_commit'}_{resumen['base_datos']}_{time.strftime('%Y%m%d_%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as destino:
+        json.dump(resumen, destino, indent=2, ensure_ascii=False, default=str)
+    print(f"Resultados guardados en {salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import time
+import multiprocessing
+
+# Configuración de producción: gunicorn -c gunicorn.conf.py
+# Todos los valores se pueden ajustar con variables de entorno
+
+# La aplicación creada al importar el módulo; con preload_app se importa una
+# sola vez en el proceso maestro
+wsgi_app = "app:app"
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Un proceso por núcleo; los hilos atienden peticiones lentas (subidas y
+# descargas en streaming) sin bloquear el proceso
+workers = int(os.getenv("GUNICORN_TRABAJADORES", str(multiprocessing.cpu_count())))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_HILOS", "4"))
+
+# Cargar la aplicación una sola vez en el proceso maestro: los trabajadores
+# comparten sus páginas de memoria y arrancan con un fork en lugar de importar
+preload_app = os.getenv("GUNICORN_PRECARGAR", "1") == "1"
+
+# Las cargas y exportaciones grandes pueden tardar varios minutos
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "600"))
+graceful_timeout = int(os.getenv("GUNICORN_TIMEOUT_CIERRE", "120"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Reiniciar trabajadores tras N peticiones acota el crecimiento de memoria; se
+# desactiva por defecto porque interrumpe los trabajos de carga en segundo plano
+max_requests = int(os.getenv("GUNICORN_MAX_PETICIONES", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_PETICIONES_VARIACION", "50"))
+
+# Límite de la línea de petición (el máximo de gunicorn); alcanza para las
+# exportaciones filtradas sin aceptar líneas de tamaño arbitrario
+limit_request_line = int(os.getenv("GUNICORN_LIMITE_LINEA", "8190"))
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG") or None
+errorlog = "-"
+loglevel = os.getenv("NIVEL_LOG", "info").lower()
+
+# Precalentar el pool y las plantillas en cada trabajador
+precalentar_trabajadores = os.getenv("PRECALENTAR", "1") == "1"
+
+
+def post_fork(server, worker):
+    worker.inicio_arranque = time.perf_counter()
+
+
+def post_worker_init(worker):
+    # Se ejecuta en el trabajador después de cargar la aplicación: las
+    # conexiones abiertas aquí no se comparten entre procesos
+    import app
+
+    if precalentar_trabajadores:
+        app.precalentar(worker.wsgi)
+
+    rss = app.rss_proceso()
+    app.registrar_evento(
+        "arranque_trabajador",
+        pid=worker.pid,
+        segundos=round(time.perf_counter() - worker.inicio_arranque, 3),
+        rss_mb=round(rss / 1e6, 1) if rss else None,
+    )